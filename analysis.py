@@ -2,8 +2,14 @@ import pandas as pd
 import sqlite3
 import networkx as nx
 import matplotlib.pyplot as plt  # Импорт для построения графиков
+from columnar import ColumnarStore
+from sketches import SketchStore
 
-def top_clients(connection):
+def top_clients(connection, approximate=False):
+    if isinstance(connection, ColumnarStore):
+        return _top_clients_columnar(connection)
+    if approximate:
+        return SketchStore.for_connection(connection, 'top_clients').top_clients()
     query = """
     SELECT c.name, COUNT(o.id) as order_count
     FROM clients c
@@ -14,16 +20,26 @@ def top_clients(connection):
     """
     return pd.read_sql_query(query, connection)
 
-def order_trends(connection):
+def order_trends(connection, approximate=False):
+    if isinstance(connection, ColumnarStore):
+        return _order_trends_columnar(connection)
+    if approximate:
+        return SketchStore.for_connection(connection, 'reservoir').order_trends()
+    # Заказы без даты (созданные до появления журнала изменений) в отчёты по дням не попадают
     query = """
     SELECT DATE(o.order_date) as order_date, COUNT(o.id) as order_count
     FROM orders o
+    WHERE o.order_date IS NOT NULL
     GROUP BY order_date
     ORDER BY order_date;
     """
     return pd.read_sql_query(query, connection)
 
-def client_network(connection):
+def client_network(connection, approximate=False):
+    if isinstance(connection, ColumnarStore):
+        return _client_network_columnar(connection)
+    if approximate:
+        return SketchStore.for_connection(connection, 'reservoir').client_network()
     query = """
     SELECT c1.name as source, c2.name as target
     FROM orders o
@@ -36,6 +52,53 @@ def client_network(connection):
     G = nx.from_pandas_edgelist(df, 'source', 'target')
     return G
 
+def distinct_clients(connection, approximate=False):
+    if approximate:
+        return SketchStore.for_connection(connection, 'distinct').distinct_clients()
+    query = """
+    SELECT o.product_id, DATE(o.order_date) as order_date, COUNT(DISTINCT o.client_id) as distinct_clients
+    FROM orders o
+    WHERE o.order_date IS NOT NULL
+    GROUP BY o.product_id, DATE(o.order_date)
+    ORDER BY o.product_id, order_date;
+    """
+    return pd.read_sql_query(query, connection)
+
+# Те же отчёты по колоночному снимку (см. columnar.py)
+def _top_clients_columnar(store):
+    clients = store.table('clients')
+    counts = pd.Series(store.column('orders', 'client_id')).value_counts()
+    df = pd.DataFrame({
+        'name': clients['name'].astype(str),
+        'order_count': clients['id'].map(counts).fillna(0).astype('int64'),
+    })
+    df = df.groupby('name', as_index=False)['order_count'].sum()
+    return df.sort_values('order_count', ascending=False, kind='stable').head(5).reset_index(drop=True)
+
+def _order_trends_columnar(store):
+    if not store.has_column('orders', 'order_date'):
+        raise ValueError("В колоночном снимке нет дат заказов: выгрузите его заново из базы, открытой приложением")
+    # Заказы без даты (NaT) в динамику не попадают
+    dates = pd.Series(store.column('orders', 'order_date')).dropna().dt.strftime('%Y-%m-%d')
+    df = dates.value_counts().sort_index().rename_axis('order_date').reset_index(name='order_count')
+    return df
+
+def _client_network_columnar(store):
+    clients = store.table('clients')
+    names = pd.Series(clients['name'].astype(str).to_numpy(), index=clients['id'].to_numpy())
+    orders = pd.DataFrame({
+        'client_id': store.column('orders', 'client_id'),
+        'product_id': store.column('orders', 'product_id'),
+    }, copy=False)
+    pairs = orders.merge(orders, on='product_id', suffixes=('_source', '_target'))
+    pairs = pairs[pairs['client_id_source'] != pairs['client_id_target']]
+    df = pd.DataFrame({
+        'source': pairs['client_id_source'].map(names),
+        'target': pairs['client_id_target'].map(names),
+    }).dropna()
+    G = nx.from_pandas_edgelist(df, 'source', 'target')
+    return G
+
 # Пример использования и визуализации данных
 if __name__ == "__main__":
     connection = sqlite3.connect('your_database.db')  #
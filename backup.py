@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+from sqlite3 import Error
+
+DEFAULT_PAGES = 64  # Количество страниц, копируемых за один шаг
+DEFAULT_SLEEP = 0.05  # Пауза между шагами (сек.), чтобы не блокировать запись
+SNAPSHOT_DIR = 'snapshots'
+BUSY_TIMEOUT = 30  # Время ожидания (сек.) снятия блокировки другим соединением
+MAX_RESTARTS = 3  # Сколько раз копирование может начаться заново из-за записи
+
+
+class _Restarted(Exception):
+    """Копирование слишком часто начиналось заново из-за записи в исходную базу."""
+
+
+def backup_database(connection, target_file, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP, progress=None):
+    """
+    Выполняет онлайн-копирование базы данных через sqlite3 backup API.
+
+    Копирование идёт порциями по `pages` страниц с паузой `sleep` между шагами,
+    поэтому приложение может продолжать записывать заказы во время копирования.
+    В режиме WAL (его включает Database) на время копирования удерживается
+    транзакция чтения: копия соответствует одному моменту времени, а запись
+    не блокируется. В обычном режиме журнала запись другим соединением
+    начинает копирование заново; после MAX_RESTARTS повторов копия делается
+    за один шаг, который блокирует запись на всё время копирования.
+    Копия сохраняется в обычном режиме журнала, чтобы быть одним файлом.
+
+    :param connection: Открытое соединение с исходной базой данных
+    :param target_file: Путь к файлу резервной копии
+    :param pages: Количество страниц за один шаг
+    :param sleep: Пауза между шагами в секундах
+    :param progress: Функция progress(copied, total), вызываемая после каждого шага
+    :return: путь к созданной резервной копии
+    """
+    restarts = 0
+    last_remaining = None
+
+    def _progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        # Каждый шаг уменьшает остаток; если он не уменьшился, копирование началось заново
+        if last_remaining is not None and remaining >= last_remaining:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise _Restarted()
+        last_remaining = remaining
+        if progress is not None:
+            progress(total - remaining, total)
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    def _done(status, remaining, total):
+        if progress is not None:
+            progress(total - remaining, total)
+
+    wal = connection.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+    hold_snapshot = wal and not connection.in_transaction
+    if hold_snapshot:
+        connection.execute('BEGIN')
+        connection.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+
+    target = sqlite3.connect(target_file)
+    try:
+        try:
+            connection.backup(target, pages=pages, progress=_progress)
+        except _Restarted:
+            connection.backup(target, pages=-1, progress=_done)
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+        if hold_snapshot:
+            connection.rollback()
+    return target_file
+
+
+def backup_file(source_file, target_file, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP, progress=None):
+    """
+    Выполняет онлайн-копирование файла базы данных через собственное соединение.
+
+    Собственное соединение позволяет запускать копирование в отдельном потоке,
+    не занимая соединение, через которое приложение записывает заказы.
+
+    :param source_file: Путь к исходной базе данных
+    :param target_file: Путь к файлу резервной копии
+    :return: путь к созданной резервной копии
+    """
+    source = sqlite3.connect(source_file, timeout=BUSY_TIMEOUT)
+    try:
+        return backup_database(source, target_file, pages, sleep, progress)
+    finally:
+        source.close()
+
+
+def snapshot_file(source_file, directory=SNAPSHOT_DIR, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP, progress=None):
+    """
+    Создаёт снимок файла базы данных через собственное соединение.
+
+    :param source_file: Путь к исходной базе данных
+    :param directory: Каталог для хранения снимков
+    :return: путь к файлу снимка
+    """
+    source = sqlite3.connect(source_file, timeout=BUSY_TIMEOUT)
+    try:
+        return create_snapshot(source, directory, pages, sleep, progress)
+    finally:
+        source.close()
+
+
+def create_snapshot(connection, directory=SNAPSHOT_DIR, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP, progress=None):
+    """
+    Создаёт снимок базы данных на текущий момент времени.
+
+    :param connection: Открытое соединение с исходной базой данных
+    :param directory: Каталог для хранения снимков
+    :return: путь к файлу снимка
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = datetime.now().strftime('orders_%Y%m%d_%H%M%S_%f.db')
+    return backup_database(connection, os.path.join(directory, name), pages, sleep, progress)
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """
+    Возвращает список снимков в каталоге, от старых к новым.
+
+    :param directory: Каталог со снимками
+    :return: список путей к файлам снимков
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.db'))
+
+
+def open_snapshot(snapshot_file):
+    """
+    Открывает снимок только для чтения, чтобы по нему строить отчёты analysis.py.
+
+    :param snapshot_file: Путь к файлу снимка
+    :return: соединение sqlite3 или None, если снимок открыть не удалось
+    """
+    try:
+        uri = 'file:{}?mode=ro'.format(os.path.abspath(snapshot_file).replace('?', '%3f'))
+        return sqlite3.connect(uri, uri=True)
+    except Error as e:
+        print(f"Ошибка при открытии снимка: {e}")
+        return None
+
+
+# Пример использования из скриптов
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Онлайн-резервное копирование orders.db")
+    parser.add_argument('source', nargs='?', default='orders.db', help="Исходная база данных")
+    parser.add_argument('target', nargs='?', help="Файл резервной копии (по умолчанию — новый снимок)")
+    parser.add_argument('--pages', type=int, default=DEFAULT_PAGES, help="Страниц за один шаг")
+    parser.add_argument('--sleep', type=float, default=DEFAULT_SLEEP, help="Пауза между шагами, сек.")
+    args = parser.parse_args()
+
+    def report(copied, total):
+        print(f"Скопировано страниц: {copied}/{total}")
+
+    source = sqlite3.connect(args.source)
+    try:
+        if args.target:
+            path = backup_database(source, args.target, args.pages, args.sleep, report)
+        else:
+            path = create_snapshot(source, pages=args.pages, sleep=args.sleep, progress=report)
+        print(f"Резервная копия создана: {path}")
+    finally:
+        source.close()
@@ -0,0 +1,255 @@
+import gzip
+import json
+import os
+import numpy as np
+import pandas as pd
+
+COLUMNAR_DIR = 'columnar'
+META_FILE = 'meta.json'
+FORMAT_VERSION = 1
+
+# Типы колонок: таблица фактов orders и измерения clients, products.
+# Строковые колонки кодируются словарём (коды int32 + список значений).
+TABLES = {
+    'orders': {'id': '<i8', 'client_id': '<i8', 'product_id': '<i8', 'order_date': '<M8[s]'},
+    'clients': {'id': '<i8', 'name': 'dict'},
+    'products': {'id': '<i8', 'name': 'dict', 'price': '<f8'},
+}
+CODES_DTYPE = '<i4'
+
+
+def _column_file(directory, table, column, compressed):
+    """Возвращает путь к файлу колонки."""
+    name = f"{table}.{column}.bin"
+    return os.path.join(directory, name + '.gz' if compressed else name)
+
+
+def _dictionary_file(directory, table, column):
+    """Возвращает путь к файлу словаря колонки."""
+    return os.path.join(directory, f"{table}.{column}.dict.json")
+
+
+def _read_meta(directory):
+    """Читает метаданные снимка или возвращает None, если снимка нет."""
+    path = os.path.join(directory, META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _write_meta(directory, meta):
+    """Атомарно записывает метаданные снимка."""
+    path = os.path.join(directory, META_FILE)
+    with open(path + '.tmp', mode='w', encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False, indent=4)
+    os.replace(path + '.tmp', path)
+
+
+def _existing_columns(connection, table):
+    """Возвращает колонки таблицы, которые поддерживает колоночный формат."""
+    names = [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+    return [column for column in TABLES[table] if column in names]
+
+
+def _encode(values, dtype):
+    """Преобразует значения колонки в типизированный массив NumPy."""
+    if dtype == '<M8[s]':
+        return pd.to_datetime(pd.Series(values, dtype=object)).to_numpy(dtype=dtype)
+    return np.asarray(values, dtype=dtype)
+
+
+def _encode_dictionary(values, dictionary):
+    """Кодирует строки словарём, дополняя его новыми значениями."""
+    index = {value: code for code, value in enumerate(dictionary)}
+    codes = np.empty(len(values), dtype=CODES_DTYPE)
+    for i, value in enumerate(values):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(dictionary)
+            dictionary.append(value)
+        codes[i] = code
+    return codes
+
+
+def _write_column(path, array, compressed, offset=None):
+    """
+    Записывает массив в файл колонки.
+
+    Если задан offset, файл обрезается до offset байт и массив дописывается в конец,
+    иначе файл перезаписывается целиком через временный файл.
+
+    :return: размер файла колонки в байтах
+    """
+    data = array.tobytes()
+    if compressed:
+        data = gzip.compress(data)
+    if offset is None:
+        with open(path + '.tmp', mode='wb') as file:
+            file.write(data)
+        os.replace(path + '.tmp', path)
+        return len(data)
+    with open(path, mode='r+b' if os.path.exists(path) else 'wb') as file:
+        file.truncate(offset)
+        file.seek(offset)
+        file.write(data)
+    return offset + len(data)
+
+
+def _export_table(connection, directory, table, meta, compressed, where='', params=()):
+    """
+    Выгружает строки таблицы в колонки и обновляет метаданные таблицы.
+
+    :return: список выгруженных id (колонка id всегда первая)
+    """
+    columns = _existing_columns(connection, table)
+    rows = connection.execute(f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY id",
+                              params).fetchall()
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+
+    previous = meta['tables'].get(table) if where else None
+    info = {'rows': len(rows) + (previous['rows'] if previous else 0), 'columns': {}}
+    for column, column_values in zip(columns, values):
+        dtype = TABLES[table][column]
+        offset = previous['columns'][column]['bytes'] if previous else None
+        if dtype == 'dict':
+            dictionary = []
+            array = _encode_dictionary(column_values, dictionary)
+            with open(_dictionary_file(directory, table, column), mode='w', encoding='utf-8') as file:
+                json.dump(dictionary, file, ensure_ascii=False)
+            dtype = CODES_DTYPE
+        else:
+            array = _encode(column_values, dtype)
+        size = _write_column(_column_file(directory, table, column, compressed), array, compressed, offset)
+        info['columns'][column] = {'dtype': TABLES[table][column], 'bytes': size}
+    meta['tables'][table] = info
+    return [row[0] for row in rows]
+
+
+def export_columnar(connection, directory=COLUMNAR_DIR, compress=False):
+    """
+    Выгружает заказы, клиентов и товары в колоночный формат на диске.
+
+    Таблица заказов дописывается инкрементально: выгружаются только заказы
+    с orders.id больше сохранённой отметки. Справочники клиентов и товаров
+    небольшие и перезаписываются целиком.
+
+    :param connection: Открытое соединение с базой данных (или со снимком)
+    :param directory: Каталог колоночного снимка
+    :param compress: Сжимать ли колонки gzip (такие колонки не отображаются в память)
+    :return: количество выгруженных заказов
+    """
+    os.makedirs(directory, exist_ok=True)
+    meta = _read_meta(directory)
+    if (meta is None or meta.get('version') != FORMAT_VERSION or meta.get('compressed') != compress
+            or meta['tables']['orders']['columns'].keys() != set(_existing_columns(connection, 'orders'))):
+        meta = {'version': FORMAT_VERSION, 'compressed': compress, 'high_water_mark': 0, 'tables': {}}
+        exported = _export_table(connection, directory, 'orders', meta, compress)
+    else:
+        exported = _export_table(connection, directory, 'orders', meta, compress,
+                                 'WHERE id > ?', (meta['high_water_mark'],))
+
+    _export_table(connection, directory, 'clients', meta, compress)
+    _export_table(connection, directory, 'products', meta, compress)
+
+    # Отметка берётся из фактически выгруженных строк: заказы, добавленные
+    # другими процессами во время выгрузки, попадут в следующую выгрузку
+    if exported:
+        meta['high_water_mark'] = max(meta['high_water_mark'], exported[-1])
+    _write_meta(directory, meta)
+    return len(exported)
+
+
+class ColumnarStore:
+    """
+    Колоночный снимок заказов, клиентов и товаров, открытый для чтения.
+
+    Несжатые колонки отображаются в память (numpy.memmap), поэтому загрузка
+    выполняется без копирования и почти мгновенно.
+    """
+
+    def __init__(self, directory=COLUMNAR_DIR):
+        """
+        Открывает колоночный снимок.
+
+        :param directory: Каталог колоночного снимка
+        """
+        self.directory = directory
+        self.meta = _read_meta(directory)
+        if self.meta is None:
+            raise FileNotFoundError(f"Колоночный снимок не найден: {directory}")
+        self.compressed = self.meta['compressed']
+        self.high_water_mark = self.meta['high_water_mark']
+
+    def has_column(self, table, column):
+        """Проверяет, выгружена ли колонка (колонки, которых нет в базе, не выгружаются)."""
+        return column in self.meta['tables'][table]['columns']
+
+    def column(self, table, column):
+        """
+        Возвращает колонку таблицы в виде массива NumPy.
+
+        :param table: Имя таблицы
+        :param column: Имя колонки
+        :return: массив значений (коды словаря для строковых колонок)
+        """
+        if not self.has_column(table, column):
+            raise KeyError(f"Колонки {table}.{column} нет в колоночном снимке {self.directory}")
+        info = self.meta['tables'][table]
+        dtype = info['columns'][column]['dtype']
+        dtype = np.dtype(CODES_DTYPE if dtype == 'dict' else dtype)
+        rows = info['rows']
+        path = _column_file(self.directory, table, column, self.compressed)
+        if self.compressed:
+            with gzip.open(path, mode='rb') as file:
+                return np.frombuffer(file.read(), dtype=dtype, count=rows)
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+
+    def dictionary(self, table, column):
+        """
+        Возвращает словарь строковой колонки.
+
+        :param table: Имя таблицы
+        :param column: Имя колонки
+        :return: список значений, индекс которого равен коду
+        """
+        with open(_dictionary_file(self.directory, table, column), encoding='utf-8') as file:
+            return json.load(file)
+
+    def table(self, table):
+        """
+        Возвращает таблицу в виде DataFrame.
+
+        Строковые колонки возвращаются как pandas.Categorical поверх кодов словаря.
+
+        :param table: Имя таблицы ('orders', 'clients' или 'products')
+        :return: pandas.DataFrame
+        """
+        data = {}
+        for column, info in self.meta['tables'][table]['columns'].items():
+            values = self.column(table, column)
+            if info['dtype'] == 'dict':
+                values = pd.Categorical.from_codes(values, categories=self.dictionary(table, column))
+            data[column] = values
+        return pd.DataFrame(data, copy=False)
+
+
+# Пример использования из скриптов
+if __name__ == "__main__":
+    import argparse
+    import sqlite3
+
+    parser = argparse.ArgumentParser(description="Выгрузка orders.db в колоночный формат")
+    parser.add_argument('source', nargs='?', default='orders.db', help="Исходная база данных")
+    parser.add_argument('directory', nargs='?', default=COLUMNAR_DIR, help="Каталог колоночного снимка")
+    parser.add_argument('--compress', action='store_true', help="Сжимать колонки gzip")
+    args = parser.parse_args()
+
+    source = sqlite3.connect(args.source)
+    try:
+        count = export_columnar(source, args.directory, args.compress)
+        print(f"Выгружено заказов: {count}")
+    finally:
+        source.close()
@@ -1,17 +1,31 @@
 import sqlite3
 from sqlite3 import Error
+import backup
+import columnar
+from models import ChangeEvent
+
+CURSOR_MAX_AGE = 24 * 60 * 60  # Через сколько секунд без обновления курсор читателя журнала устаревает
 
 class Database:
     def __init__(self, db_file='orders.db'):
         """Инициализирует базу данных и создаёт необходимые таблицы."""
+        self.db_file = db_file
         self.connection = self.create_connection(db_file)
+        self.subscribers = []  # Пары (функция, таблица) подписчиков на изменения
+        self.pending_events = []  # События, ожидающие фиксации транзакции
         self.create_tables()
 
     def create_connection(self, db_file):
-        """Создаёт соединение с SQLite базой данных."""
+        """
+        Создаёт соединение с SQLite базой данных.
+
+        База переводится в режим WAL: чтение (отчёты, резервное копирование)
+        не блокирует запись заказов, а запись не прерывает копирование.
+        """
         conn = None
         try:
             conn = sqlite3.connect(db_file)
+            conn.execute('PRAGMA journal_mode=WAL')
             print(f"Соединение с SQLite установлено: {db_file}")
             return conn
         except Error as e:
@@ -43,29 +57,87 @@ class Database:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 client_id INTEGER NOT NULL,
                 product_id INTEGER NOT NULL,
+                order_date TEXT,
                 FOREIGN KEY (client_id) REFERENCES clients (id),
                 FOREIGN KEY (product_id) REFERENCES products (id)
             )
             ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                action TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_cursors (
+                consumer TEXT PRIMARY KEY,
+                change_id INTEGER NOT NULL,
+                updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sketches (
+                name TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sketch_samples (
+                slot INTEGER PRIMARY KEY,
+                order_id INTEGER NOT NULL,
+                client_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                order_date TEXT
+            )
+            ''')
+            self.migrate_orders(cursor)
             self.connection.commit()
         except Error as e:
             print(f"Ошибка при создании таблицы: {e}")
 
-    def add_client(self, name, email, phone):
+    def migrate_orders(self, cursor):
+        """
+        Добавляет дату заказа в таблицу orders, созданную без неё.
+
+        Дата существующих заказов берётся из журнала изменений. Заказы, созданные
+        до появления журнала, остаются без даты и не учитываются в отчётах по дням.
+        """
+        columns = [row[1] for row in cursor.execute(''' PRAGMA table_info(orders) ''')]
+        if 'order_date' in columns:
+            return
+        cursor.execute(''' ALTER TABLE orders ADD COLUMN order_date TEXT ''')
+        cursor.execute('''
+        UPDATE orders SET order_date = (
+            SELECT MIN(l.changed_at) FROM change_log l
+            WHERE l.table_name = 'orders' AND l.action = 'insert' AND l.row_id = orders.id
+        )
+        ''')
+
+    def add_client(self, name, email, phone, commit=True):
         """Добавляет клиента в базу данных."""
         sql = ''' INSERT INTO clients(name, email, phone)
                   VALUES(?,?,?) '''
         cur = self.connection.cursor()
         cur.execute(sql, (name, email, phone))
-        self.connection.commit()
+        self.record_change('clients', ChangeEvent.INSERT, cur.lastrowid)
+        if commit:
+            self.commit()
         return cur.lastrowid
 
-    def delete_client(self, name):
+    def delete_client(self, name, commit=True):
         """Удаляет клиента из базы данных по имени."""
         sql = ''' DELETE FROM clients WHERE name = ? '''
         cur = self.connection.cursor()
+        cur.execute(''' SELECT id FROM clients WHERE name = ? ''', (name,))
+        client_ids = [row[0] for row in cur.fetchall()]
         cur.execute(sql, (name,))
-        self.connection.commit()
+        for client_id in client_ids:
+            self.record_change('clients', ChangeEvent.DELETE, client_id)
+        if commit:
+            self.commit()
 
     def get_all_clients(self):
         """Получает всех клиентов из базы данных."""
@@ -74,15 +146,31 @@ class Database:
         cur.execute(sql)
         return cur.fetchall()
 
-    def add_product(self, name, price):
+    def add_product(self, name, price, commit=True):
         """Добавляет продукт в базу данных."""
         sql = ''' INSERT INTO products(name, price)
                   VALUES(?,?) '''
         cur = self.connection.cursor()
         cur.execute(sql, (name, price))
-        self.connection.commit()
+        self.record_change('products', ChangeEvent.INSERT, cur.lastrowid)
+        if commit:
+            self.commit()
         return cur.lastrowid
 
+    def get_client(self, client_id):
+        """Получает клиента по идентификатору."""
+        sql = ''' SELECT * FROM clients WHERE id = ? '''
+        cur = self.connection.cursor()
+        cur.execute(sql, (client_id,))
+        return cur.fetchone()
+
+    def get_product(self, product_id):
+        """Получает продукт по идентификатору."""
+        sql = ''' SELECT * FROM products WHERE id = ? '''
+        cur = self.connection.cursor()
+        cur.execute(sql, (product_id,))
+        return cur.fetchone()
+
     def get_all_products(self):
         """Получает все продукты из базы данных."""
         sql = ''' SELECT * FROM products '''
@@ -90,15 +178,115 @@ class Database:
         cur.execute(sql)
         return cur.fetchall()
 
-    def add_order(self, order):
+    def add_order(self, order, commit=True):
         """Добавляет заказ в базу данных."""
-        sql = ''' INSERT INTO orders(client_id, product_id)
-                  VALUES(?,?) '''
+        sql = ''' INSERT INTO orders(client_id, product_id, order_date)
+                  VALUES(?,?,CURRENT_TIMESTAMP) '''
         cur = self.connection.cursor()
         cur.execute(sql, (order.client_id, order.product_id))
-        self.connection.commit()
+        self.record_change('orders', ChangeEvent.INSERT, cur.lastrowid)
+        if commit:
+            self.commit()
         return cur.lastrowid
 
+    def record_change(self, table, action, row_id):
+        """Записывает изменение в журнал; подписчики получат его после фиксации."""
+        sql = ''' INSERT INTO change_log(table_name, action, row_id)
+                  VALUES(?,?,?) '''
+        cur = self.connection.cursor()
+        cur.execute(sql, (table, action, row_id))
+        self.pending_events.append(ChangeEvent(table, action, row_id, cur.lastrowid))
+
+    def commit(self):
+        """Фиксирует транзакцию и рассылает накопленные события подписчикам."""
+        self.connection.commit()
+        events, self.pending_events = self.pending_events, []
+        for event in events:
+            for callback, table in list(self.subscribers):
+                if table is None or table == event.table:
+                    try:
+                        callback(event)
+                    except Exception as e:
+                        print(f"Ошибка в обработчике изменений: {e}")
+
+    def rollback(self):
+        """Откатывает транзакцию и отбрасывает накопленные события."""
+        self.connection.rollback()
+        self.pending_events = []
+
+    def subscribe(self, callback, table=None):
+        """Подписывает функцию callback(event) на изменения таблицы (или всех таблиц)."""
+        self.subscribers.append((callback, table))
+        return callback
+
+    def unsubscribe(self, callback):
+        """Отменяет подписку функции на изменения."""
+        self.subscribers = [(c, t) for c, t in self.subscribers if c != callback]  # Методы сравниваются по ==, не по is
+
+    def get_changes(self, since_id=0, limit=1000):
+        """Получает изменения из журнала после since_id (для других процессов)."""
+        sql = ''' SELECT id, table_name, action, row_id FROM change_log
+                  WHERE id > ? ORDER BY id LIMIT ? '''
+        cur = self.connection.cursor()
+        cur.execute(sql, (since_id, limit))
+        return [ChangeEvent(table, action, row_id, change_id) for change_id, table, action, row_id in cur.fetchall()]
+
+    def get_last_change_id(self):
+        """Возвращает номер последней записи в журнале изменений."""
+        cur = self.connection.cursor()
+        cur.execute(''' SELECT COALESCE(MAX(id), 0) FROM change_log ''')
+        return cur.fetchone()[0]
+
+    def save_cursor(self, consumer, change_id, commit=True):
+        """
+        Запоминает, до какого изменения журнал прочитан читателем consumer,
+        и удаляет из журнала изменения, прочитанные всеми активными читателями.
+        """
+        sql = ''' INSERT OR REPLACE INTO change_cursors(consumer, change_id, updated_at)
+                  VALUES(?,?,CURRENT_TIMESTAMP) '''
+        cur = self.connection.cursor()
+        cur.execute(sql, (consumer, change_id))
+        self.prune_changes(commit=False)
+        if commit:
+            self.commit()
+
+    def remove_cursor(self, consumer, commit=True):
+        """Удаляет курсор читателя журнала, который больше не опрашивает изменения."""
+        cur = self.connection.cursor()
+        cur.execute(''' DELETE FROM change_cursors WHERE consumer = ? ''', (consumer,))
+        if commit:
+            self.commit()
+
+    def prune_changes(self, commit=True):
+        """
+        Удаляет из журнала изменения, прочитанные всеми активными читателями.
+
+        Курсоры, не обновлявшиеся дольше CURSOR_MAX_AGE секунд, удаляются. Если
+        активных читателей нет, журнал не очищается. Последняя запись остаётся
+        всегда, чтобы номера изменений продолжали расти.
+        """
+        cur = self.connection.cursor()
+        cur.execute(''' DELETE FROM change_cursors WHERE updated_at < datetime('now', ?) ''',
+                    (f'-{CURSOR_MAX_AGE} seconds',))
+        cur.execute(''' DELETE FROM change_log
+                        WHERE id <= (SELECT MIN(change_id) FROM change_cursors)
+                        AND id < (SELECT MAX(id) FROM change_log) ''')
+        if commit:
+            self.commit()
+        return cur.rowcount
+
+    def backup(self, target_file, progress=None):
+        """Создаёт онлайн-резервную копию базы данных через отдельное соединение."""
+        return backup.backup_file(self.db_file, target_file, progress=progress)
+
+    def create_snapshot(self, progress=None):
+        """Создаёт снимок базы данных для построения отчётов через отдельное соединение."""
+        return backup.snapshot_file(self.db_file, progress=progress)
+
+    def export_columnar(self, directory=columnar.COLUMNAR_DIR, compress=False):
+        """Выгружает новые заказы и справочники в колоночный снимок для аналитики."""
+        return columnar.export_columnar(self.connection, directory, compress)
+
     def close(self):
         """Закрывает соединение с базой данных."""
         if self.connection:
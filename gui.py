@@ -3,14 +3,23 @@ import tkinter as tk
 from tkinter import messagebox, filedialog
 from tkinter import ttk
 import re
+import queue
+import threading
+import uuid
 import csv
 import json
 import matplotlib.pyplot as plt
 import seaborn as sns
 import networkx as nx
-from models import Client, Product, Order  # Импортируем классы
+from models import Client, Product, Order, ChangeEvent  # Импортируем классы
 from db import Database  # Импортируем нашу базу данных
 import analysis  # Импортируем модуль анализа
+import backup  # Импортируем модуль резервного копирования
+from sketches import SketchStore  # Импортируем скетчи для приближённой аналитики
+
+CHANGE_POLL_INTERVAL = 1000  # Период опроса журнала изменений, мс
+CHANGE_CHECK_INTERVAL = 100  # Период проверки ответа сервера на опрос журнала, мс
+BACKUP_POLL_INTERVAL = 100  # Период проверки хода резервного копирования, мс
 
 
 class OrderManagementApp:
@@ -21,8 +30,8 @@ class OrderManagementApp:
     --------
     root : tkinter.Tk
         Главное окно приложения.
-    db : Database
-        Объект подключения и взаимодействия с базой данных.
+    db : Database or RemoteDatabase
+        Объект подключения и взаимодействия с базой данных (напрямую или через сервер заказов).
     notebook : ttk.Notebook
         Виджет вкладок интерфейса.
     clients_tab : ttk.Frame
@@ -46,10 +55,26 @@ class OrderManagementApp:
         Проверяет корректность введенной цены.
     create_order_widgets():
         Создает интерфейс для добавления нового заказа.
-    load_clients():
+    load_clients(clients=None):
         Загружает список клиентов из базы данных и отображает.
-    load_products():
+    load_products(products=None):
         Загружает список товаров из базы данных.
+    apply_change(event):
+        Применяет изменение из базы данных к спискам интерфейса.
+    is_new_change(event):
+        Проверяет, что изменение ещё не применялось.
+    fetch_row(event):
+        Получает изменённую строку из базы данных.
+    apply_row(event, row):
+        Отображает изменённую строку в списках интерфейса.
+    poll_changes():
+        Периодически забирает изменения, сделанные другими процессами.
+    fetch_changes(since_id):
+        Получает изменения журнала и сохраняет курсор приложения.
+    check_changes():
+        Передаёт полученные в потоке изменения в интерфейс.
+    apply_polled(result):
+        Применяет изменения, полученные опросом журнала.
     add_order():
         Добавляет новый заказ в базу данных.
     get_client_id(client_name):
@@ -74,6 +99,20 @@ class OrderManagementApp:
         Экспортирует данные в CSV файл.
     export_to_json():
         Экспортирует данные в JSON файл.
+    backup_database():
+        Создаёт онлайн-резервную копию базы данных.
+    create_snapshot():
+        Создаёт снимок базы данных для построения отчётов.
+    run_in_background(task, on_done):
+        Выполняет резервное копирование в отдельном потоке.
+    check_background(on_done):
+        Передаёт ход копирования из потока в интерфейс.
+    report_progress(copied, total):
+        Отображает прогресс резервного копирования.
+    analysis_connection():
+        Возвращает соединение, по которому строятся отчёты.
+    run_report(name):
+        Строит отчёт analysis.py локально или на сервере заказов.
     create_chart_widgets():
         Создает кнопки для отображения аналитических графиков.
     show_top_clients():
@@ -86,7 +125,7 @@ class OrderManagementApp:
         Обрабатывает событие закрытия окна, закрывает соединение с БД.
     """
 
-    def __init__(self, root):
+    def __init__(self, root, db=None):
         """
         Инициализация главного окна и компонентов интерфейса.
 
@@ -94,9 +133,20 @@ class OrderManagementApp:
         ----------
         root : tkinter.Tk
             Главное окно приложения.
+        db : Database or RemoteDatabase, optional
+            База данных; по умолчанию открывается локальный файл orders.db.
         """
         self.root = root
-        self.db = Database()  # Инициализируем базу данных
+        self.db = db if db is not None else Database()  # Инициализируем базу данных
+        self.snapshot_connection = None  # Соединение со снимком для отчётов
+        self.backup_thread = None  # Поток резервного копирования
+        self.backup_events = queue.Queue()  # Ход копирования для главного потока
+        self.clients = {}  # Клиенты по id, обновляются по событиям изменений
+        self.products = {}  # Товары по id, обновляются по событиям изменений
+        self.client_ids = []  # id клиентов в порядке строк task_listbox
+        self.applied_changes = set()  # Применённые события новее last_change_id
+        self.change_results = queue.Queue()  # Результаты опроса журнала сервера для главного потока
+        self.consumer = f"gui-{uuid.uuid4().hex[:8]}"  # Имя курсора приложения в журнале изменений
 
         self.root.title("Система учета заказов")
         self.root.geometry("800x600+300+300")
@@ -128,9 +178,15 @@ class OrderManagementApp:
         self.create_export_widgets()
         self.create_chart_widgets()
 
-        # Загружаем данные из базы
+        # Загружаем данные из базы, дальше списки обновляются по событиям изменений
+        self.last_change_id = self.db.get_last_change_id()
+        self.db.save_cursor(self.consumer, self.last_change_id)  # Журнал после курсора не очищается
         self.load_clients()
         self.load_products()
+        if isinstance(self.db, Database):
+            self.db.subscribe(self.apply_change)
+            SketchStore.attach(self.db)  # Скетчи обновляются по мере добавления заказов
+        self.root.after(CHANGE_POLL_INTERVAL, self.poll_changes)
 
     def create_product_widgets(self):
         """
@@ -160,7 +216,6 @@ class OrderManagementApp:
         if product_name and self.is_valid_price(product_price):
             price = float(product_price)
             self.db.add_product(product_name, price)
-            self.product_display.insert(tk.END, f'Товар: {product_name}, Цена: {price:.2f}\n')
             self.product_name_var.set("")
             self.product_price_var.set("")
         else:
@@ -200,30 +255,241 @@ class OrderManagementApp:
         tk.Label(self.orders_tab, text="Выберите товар:", font=('Arial', 10, 'bold')).pack(pady=5)
         self.product_dropdown = ttk.Combobox(self.orders_tab, textvariable=self.product_var)
         self.product_dropdown.pack(pady=5)
-        self.load_products()
 
         tk.Button(self.orders_tab, text="Добавить заказ", command=self.add_order).pack(pady=10)
 
         self.orders_display = tk.Text(self.orders_tab, height=15, width=50)
         self.orders_display.pack(pady=10)
 
-    def load_clients(self):
+    def load_clients(self, clients=None):
         """
         Загружает список клиентов из базы и отображает их в интерфейсе.
-        """
-        clients = self.db.get_all_clients()
-        self.client_dropdown['values'] = [client[1] for client in clients]  # Имена клиентов
-        # Предполагается, что каждый клиент - кортеж (id, name, email, phone)
 
-        # дополнительно можно обновить список отображения
-        # (здесь вызывается, например, только для обновления dropdown)
+        Parameters
+        ----------
+        clients : list, optional
+            Уже полученные из базы строки клиентов.
+        """
+        # Каждый клиент - кортеж (id, name, email, phone)
+        if clients is None:
+            clients = self.db.get_all_clients()
+        self.clients = {client[0]: client for client in clients}
+        self.client_ids = list(self.clients)
+        self.task_listbox.delete(0, tk.END)
+        for client in self.clients.values():
+            self.task_listbox.insert(tk.END, f"{client[1]} | {client[2]} | {client[3]}")
+        self.client_dropdown['values'] = [client[1] for client in self.clients.values()]  # Имена клиентов
 
-    def load_products(self):
+    def load_products(self, products=None):
         """
         Загружает список товаров из базы.
+
+        Parameters
+        ----------
+        products : list, optional
+            Уже полученные из базы строки товаров.
+        """
+        if products is None:
+            products = self.db.get_all_products()
+        self.products = {product[0]: product for product in products}
+        self.product_dropdown['values'] = [product[1] for product in self.products.values()]  # Имена продуктов
+
+    def apply_change(self, event):
+        """
+        Применяет изменение из базы данных к спискам интерфейса без их полной перезагрузки.
+
+        Parameters
+        ----------
+        event : ChangeEvent
+            Событие изменения строки таблицы.
+        """
+        if self.is_new_change(event):
+            self.apply_row(event, self.fetch_row(event))
+
+    def is_new_change(self, event):
+        """
+        Проверяет, что изменение ещё не применялось, и запоминает его.
+
+        Курсор last_change_id двигает только опрос журнала: события этого процесса
+        приходят раньше, чем изменения других процессов с меньшими номерами,
+        поэтому применённые события новее курсора хранятся в applied_changes.
+
+        Parameters
+        ----------
+        event : ChangeEvent
+            Событие изменения строки таблицы.
+
+        Returns
+        -------
+        bool
+            True, если изменение нужно применить.
+        """
+        if event.change_id is None:
+            return True
+        if event.change_id <= self.last_change_id or event.change_id in self.applied_changes:
+            return False
+        self.applied_changes.add(event.change_id)
+        return True
+
+    def fetch_row(self, event):
+        """
+        Получает из базы строку, затронутую изменением.
+
+        Parameters
+        ----------
+        event : ChangeEvent
+            Событие изменения строки таблицы.
+
+        Returns
+        -------
+        tuple or None
+            Строка клиента или товара; None для удаления или другой таблицы.
         """
-        products = self.db.get_all_products()
-        self.product_dropdown['values'] = [product[1] for product in products]  # Имена продуктов
+        if event.action == ChangeEvent.DELETE:
+            return None
+        if event.table == 'clients':
+            return self.db.get_client(event.row_id)
+        if event.table == 'products':
+            return self.db.get_product(event.row_id)
+        return None
+
+    def apply_row(self, event, row):
+        """
+        Отображает изменённую строку в списках интерфейса.
+
+        Parameters
+        ----------
+        event : ChangeEvent
+            Событие изменения строки таблицы.
+        row : tuple or None
+            Строка, полученная fetch_row.
+        """
+        if event.table == 'clients':
+            if event.action == ChangeEvent.DELETE:
+                if self.clients.pop(event.row_id, None) is not None:
+                    index = self.client_ids.index(event.row_id)
+                    del self.client_ids[index]
+                    self.task_listbox.delete(index)
+            else:
+                client = row
+                if client is None:
+                    return
+                entry = f"{client[1]} | {client[2]} | {client[3]}"
+                if client[0] in self.clients:
+                    index = self.client_ids.index(client[0])
+                    self.task_listbox.delete(index)
+                    self.task_listbox.insert(index, entry)
+                else:
+                    self.client_ids.append(client[0])
+                    self.task_listbox.insert(tk.END, entry)
+                self.clients[client[0]] = client
+            self.client_dropdown['values'] = [client[1] for client in self.clients.values()]
+
+        elif event.table == 'products':
+            if event.action == ChangeEvent.DELETE:
+                self.products.pop(event.row_id, None)
+            else:
+                product = row
+                if product is None:
+                    return
+                if event.action == ChangeEvent.INSERT and product[0] not in self.products:
+                    self.product_display.insert(tk.END, f'Товар: {product[1]}, Цена: {product[2]:.2f}\n')
+                self.products[product[0]] = product
+            self.product_dropdown['values'] = [product[1] for product in self.products.values()]
+
+    def poll_changes(self):
+        """
+        Забирает из журнала изменения, сделанные другими процессами, и применяет их.
+
+        При работе через сервер запрос выполняется в отдельном потоке, чтобы медленный
+        или недоступный сервер не останавливал интерфейс.
+        """
+        if isinstance(self.db, Database):
+            try:
+                self.apply_polled(self.fetch_changes(self.last_change_id))
+            except Exception as e:
+                print(f"Ошибка при получении изменений: {e}")
+            self.root.after(CHANGE_POLL_INTERVAL, self.poll_changes)
+            return
+
+        since_id = self.last_change_id
+
+        def work():
+            try:
+                self.change_results.put(self.fetch_changes(since_id))
+            except Exception as e:
+                self.change_results.put(('error', e))
+
+        threading.Thread(target=work, daemon=True).start()
+        self.root.after(CHANGE_CHECK_INTERVAL, self.check_changes)
+
+    def fetch_changes(self, since_id):
+        """
+        Получает изменения журнала после since_id вместе с изменёнными строками
+        и сохраняет курсор приложения, чтобы прочитанную часть журнала можно было удалить.
+
+        Не обращается к виджетам, поэтому при работе через сервер выполняется в отдельном потоке.
+
+        Parameters
+        ----------
+        since_id : int
+            Номер последнего полученного изменения.
+
+        Returns
+        -------
+        tuple
+            ('changes', [(event, row), ...]) или ('reload', (clients, products, last_change_id)),
+            если изменения после since_id уже удалены из журнала.
+        """
+        events = self.db.get_changes(since_id)
+        if events and events[0].change_id > since_id + 1:
+            # Номера изменений идут подряд: пропуск значит, что курсор устарел и журнал очищен
+            last_change_id = self.db.get_last_change_id()
+            result = ('reload', (self.db.get_all_clients(), self.db.get_all_products(), last_change_id))
+        else:
+            last_change_id = events[-1].change_id if events else since_id
+            result = ('changes', [(event, self.fetch_row(event)) for event in events])
+        if last_change_id != since_id:
+            self.db.save_cursor(self.consumer, last_change_id)
+        return result
+
+    def check_changes(self):
+        """
+        Передаёт изменения, полученные в потоке, в интерфейс (выполняется в главном потоке).
+        """
+        try:
+            kind, value = self.change_results.get_nowait()
+        except queue.Empty:
+            self.root.after(CHANGE_CHECK_INTERVAL, self.check_changes)
+            return
+        if kind == 'error':
+            print(f"Ошибка при получении изменений: {value}")
+        else:
+            self.apply_polled((kind, value))
+        self.root.after(CHANGE_POLL_INTERVAL, self.poll_changes)
+
+    def apply_polled(self, result):
+        """
+        Применяет результат fetch_changes и двигает курсор last_change_id.
+
+        Parameters
+        ----------
+        result : tuple
+            Результат fetch_changes.
+        """
+        kind, value = result
+        if kind == 'reload':
+            clients, products, self.last_change_id = value
+            self.applied_changes = set()
+            self.load_clients(clients)
+            self.load_products(products)
+            return
+        for event, row in value:
+            if self.is_new_change(event):
+                self.apply_row(event, row)
+            self.last_change_id = event.change_id
+        self.applied_changes = {change_id for change_id in self.applied_changes
+                                if change_id > self.last_change_id}
 
     def add_order(self):
         """
@@ -255,7 +521,7 @@ class OrderManagementApp:
         int or None
             Идентификатор клиента или None, если не найден.
         """
-        client = next((client for client in self.db.get_all_clients() if client[1] == client_name), None)
+        client = next((client for client in self.clients.values() if client[1] == client_name), None)
         return client[0] if client else None
 
     def get_product_id(self, product_name):
@@ -272,9 +538,8 @@ class OrderManagementApp:
         int or None
             Идентификатор товара или None, если не найден.
         """
-        product = next((product for product in self.db.get_all_products() if product[1] == product_name), None)
+        product = next((product for product in self.products.values() if product[1] == product_name), None)
         return product[0] if product else None
-        self.load_products()
 
     def create_client_widgets(self):
         """
@@ -329,12 +594,10 @@ class OrderManagementApp:
             return
 
         self.db.add_client(name, email, phone)
-        self.task_listbox.insert(tk.END, f"{name} | {email} | {phone}")
 
         self.entry_1.delete(0, tk.END)
         self.entry_2.delete(0, tk.END)
         self.entry_3.delete(0, tk.END)
-        self.load_clients()
 
     def delete_entry(self):
         """
@@ -347,10 +610,8 @@ class OrderManagementApp:
 
         selected_entry = self.task_listbox.get(selected_index)
         name = selected_entry.split(" | ")[0]
-        self.db.delete_client(name)  # Предполагается, что этот метод реализован
-        self.task_listbox.delete(selected_index)
+        self.db.delete_client(name)
         messagebox.showinfo("Удаление", f"Клиент '{name}' успешно удален.")
-        self.load_clients()
 
     def is_valid_name(self, name):
         """
@@ -413,6 +674,25 @@ class OrderManagementApp:
         export_json_button = tk.Button(self.export_tab, text="Экспорт в JSON", command=self.export_to_json)
         export_json_button.pack(pady=5)
 
+        tk.Label(self.export_tab, text="Резервное копирование:", font=('Arial', 10, 'bold')).pack(pady=10)
+
+        tk.Button(self.export_tab, text="Резервная копия", command=self.backup_database).pack(pady=5)
+        snapshot_button = tk.Button(self.export_tab, text="Создать снимок", command=self.create_snapshot)
+        snapshot_button.pack(pady=5)
+
+        self.use_snapshot_var = tk.BooleanVar(value=False)
+        snapshot_check = tk.Checkbutton(self.export_tab, text="Строить отчёты по последнему снимку",
+                                        variable=self.use_snapshot_var)
+        snapshot_check.pack(pady=5)
+
+        if not isinstance(self.db, Database):
+            # При работе через сервер копии создаются на сервере, локальных снимков нет
+            snapshot_button.config(state=tk.DISABLED)
+            snapshot_check.config(state=tk.DISABLED)
+
+        self.backup_progress = ttk.Progressbar(self.export_tab, length=300, mode='determinate')
+        self.backup_progress.pack(pady=5)
+
     def export_to_csv(self):
         """
         Экспортирует список клиентов и заказов в CSV-файл.
@@ -450,6 +730,147 @@ class OrderManagementApp:
 
         messagebox.showinfo("Экспорт завершен", "Данные успешно экспортированы в JSON.")
 
+    def backup_database(self):
+        """
+        Создаёт онлайн-резервную копию базы данных в выбранный файл.
+
+        При работе через сервер заказов копия создаётся в каталоге снимков сервера.
+        """
+        if not isinstance(self.db, Database):
+            def done_remote(name):
+                messagebox.showinfo("Резервное копирование", f"Резервная копия создана на сервере: {name}")
+
+            self.run_in_background(lambda progress: self.db.create_snapshot(), done_remote)
+            return
+
+        file_path = filedialog.asksaveasfilename(defaultextension='.db',
+                                                 filetypes=[("SQLite files", '*.db'), ("All files", '*.*')])
+        if not file_path:
+            return
+
+        def done(path):
+            messagebox.showinfo("Резервное копирование", f"Резервная копия сохранена: {path}")
+
+        self.run_in_background(lambda progress: self.db.backup(file_path, progress=progress), done)
+
+    def create_snapshot(self):
+        """
+        Создаёт снимок базы данных, по которому можно строить отчёты.
+        """
+        def done(snapshot_file):
+            if self.snapshot_connection:
+                self.snapshot_connection.close()
+            self.snapshot_connection = backup.open_snapshot(snapshot_file)
+            messagebox.showinfo("Резервное копирование", f"Снимок создан: {snapshot_file}")
+
+        self.run_in_background(lambda progress: self.db.create_snapshot(progress=progress), done)
+
+    def run_in_background(self, task, on_done):
+        """
+        Выполняет резервное копирование в отдельном потоке, чтобы не блокировать ввод заказов.
+
+        Parameters
+        ----------
+        task : callable
+            Функция task(progress), выполняющая копирование через собственное соединение.
+        on_done : callable
+            Функция on_done(result), вызываемая в главном потоке по завершении.
+        """
+        if self.backup_thread is not None and self.backup_thread.is_alive():
+            messagebox.showwarning("Резервное копирование", "Копирование уже выполняется.")
+            return
+
+        def work():
+            try:
+                result = task(lambda copied, total: self.backup_events.put(('progress', (copied, total))))
+            except Exception as e:
+                self.backup_events.put(('error', e))
+            else:
+                self.backup_events.put(('done', result))
+
+        self.backup_thread = threading.Thread(target=work, daemon=True)
+        self.backup_thread.start()
+        self.root.after(BACKUP_POLL_INTERVAL, self.check_background, on_done)
+
+    def check_background(self, on_done):
+        """
+        Передаёт ход копирования из потока в интерфейс (выполняется в главном потоке).
+
+        Parameters
+        ----------
+        on_done : callable
+            Функция on_done(result), вызываемая по завершении копирования.
+        """
+        while True:
+            try:
+                kind, value = self.backup_events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                self.report_progress(*value)
+            elif kind == 'error':
+                messagebox.showerror("Резервное копирование", f"Ошибка при копировании: {value}")
+                return
+            else:
+                on_done(value)
+                return
+        self.root.after(BACKUP_POLL_INTERVAL, self.check_background, on_done)
+
+    def report_progress(self, copied, total):
+        """
+        Отображает прогресс резервного копирования.
+
+        Parameters
+        ----------
+        copied : int
+            Количество скопированных страниц.
+        total : int
+            Общее количество страниц.
+        """
+        self.backup_progress['maximum'] = max(total, 1)
+        self.backup_progress['value'] = copied
+
+    def analysis_connection(self):
+        """
+        Возвращает соединение, по которому строятся отчёты.
+
+        Returns
+        -------
+        sqlite3.Connection
+            Соединение со снимком, если он выбран, иначе с основной базой
+            (None при работе через сервер заказов).
+        """
+        if self.use_snapshot_var.get():
+            if self.snapshot_connection is None:
+                snapshots = backup.list_snapshots()
+                if snapshots:
+                    self.snapshot_connection = backup.open_snapshot(snapshots[-1])
+            if self.snapshot_connection is not None:
+                return self.snapshot_connection
+        return self.db.connection
+
+    def run_report(self, name):
+        """
+        Строит отчёт analysis.py по локальному соединению или на сервере заказов.
+
+        Если отмечены приближённые отчёты, они строятся по скетчам (см. sketches.py).
+
+        Parameters
+        ----------
+        name : str
+            Имя функции отчёта: 'top_clients', 'order_trends' или 'client_network'.
+
+        Returns
+        -------
+        pandas.DataFrame or networkx.Graph
+            Результат отчёта.
+        """
+        approximate = self.approximate_var.get()
+        connection = self.analysis_connection()
+        if connection is None:
+            return self.db.report(name, approximate)
+        return getattr(analysis, name)(connection, approximate)
+
     def create_chart_widgets(self):
         """
         Создает кнопки для отображения графиков аналитики.
@@ -458,14 +879,26 @@ class OrderManagementApp:
         tk.Button(self.charts_tab, text="Динамика заказов", command=self.show_order_trends).pack(pady=10)
         tk.Button(self.charts_tab, text="География клиентов", command=self.show_client_network).pack(pady=10)
 
+        self.approximate_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.charts_tab, text="Приближённые отчёты (быстро, с оценкой погрешности)",
+                       variable=self.approximate_var).pack(pady=10)
+
     def show_top_clients(self):
         """
         Отображает график топ-5 клиентов по заказам.
         """
-        df_top_clients = analysis.top_clients(self.db.connection)
+        df_top_clients = self.run_report('top_clients')
         plt.figure(figsize=(10, 5))
-        sns.barplot(x='order_count', hue='name', data=df_top_clients, palette='viridis')
-        plt.title("ТОП-5 клиентов по количеству заказов")
+        if 'error_bound' in df_top_clients:
+            # Приближённый отчёт: истинное количество в [order_count - error_bound, order_count]
+            plt.barh(df_top_clients['name'], df_top_clients['order_count'],
+                     xerr=[df_top_clients['error_bound'], [0] * len(df_top_clients)],
+                     color=sns.color_palette('viridis', len(df_top_clients)), capsize=4)
+            plt.gca().invert_yaxis()
+            plt.title("ТОП-5 клиентов по количеству заказов (приближённо, с погрешностью)")
+        else:
+            sns.barplot(x='order_count', hue='name', data=df_top_clients, palette='viridis')
+            plt.title("ТОП-5 клиентов по количеству заказов")
         plt.xlabel("Количество заказов")
         plt.ylabel("Клиенты")
         plt.show()
@@ -474,10 +907,17 @@ class OrderManagementApp:
         """
         Отображает график динамики заказов по датам.
         """
-        df_order_trends = analysis.order_trends(self.db.connection)
+        df_order_trends = self.run_report('order_trends')
         plt.figure(figsize=(10, 5))
         sns.lineplot(x='order_date', y='order_count', data=df_order_trends, marker='o')
-        plt.title("Динамика количества заказов по датам")
+        if 'error_bound' in df_order_trends:
+            # Приближённый отчёт: 95% доверительный интервал
+            plt.fill_between(df_order_trends['order_date'],
+                             df_order_trends['order_count'] - df_order_trends['error_bound'],
+                             df_order_trends['order_count'] + df_order_trends['error_bound'], alpha=0.3)
+            plt.title("Динамика количества заказов по датам (приближённо, 95% интервал)")
+        else:
+            plt.title("Динамика количества заказов по датам")
         plt.xticks(rotation=45)
         plt.xlabel("Дата")
         plt.ylabel("Количество заказов")
@@ -487,17 +927,30 @@ class OrderManagementApp:
         """
         Визуализирует сеть клиентов с помощью графа.
         """
-        G = analysis.client_network(self.db.connection)
+        G = self.run_report('client_network')
         plt.figure(figsize=(12, 12))
         pos = nx.spring_layout(G)
         nx.draw(G, pos, with_labels=True, labels=nx.get_node_attributes(G, 'label'))
-        plt.title("Сеть клиентов")
+        if 'edge_recall_lower_bound' in G.graph:
+            plt.title(f"Сеть клиентов (выборка {G.graph['sample_fraction']:.1%} заказов, "
+                      f"каждая связь найдена с вероятностью не ниже {G.graph['edge_recall_lower_bound']:.1%}, "
+                      f"связей всего около {G.graph['edges_estimate']:.0f})")
+        else:
+            plt.title("Сеть клиентов")
         plt.show()
 
     def on_closing(self):
         """
         Обрабатывает событие закрытия окна: закрывает соединение с БД.
         """
+        if self.snapshot_connection:
+            self.snapshot_connection.close()
+        if isinstance(self.db, Database):
+            SketchStore.detach(self.db)
+        try:
+            self.db.remove_cursor(self.consumer)
+        except Exception as e:
+            print(f"Ошибка при удалении курсора журнала: {e}")
         self.db.close()
         self.root.destroy()
 
@@ -1,7 +1,13 @@
+import argparse
 import tkinter as tk
 from gui import OrderManagementApp
+from server import RemoteDatabase
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Система учета заказов")
+    parser.add_argument('--server', help="Адрес сервера заказов, например http://127.0.0.1:8765")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = OrderManagementApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = OrderManagementApp(root, RemoteDatabase(args.server) if args.server else None)
+    root.mainloop()
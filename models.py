@@ -58,16 +58,16 @@ class Order:
     Класс для представления заказа, связанного с клиентом и товаром, а также количеством.
     """
 
-    def __init__(self, client, product, quantity):
+    def __init__(self, client_id, product_id, quantity=1):
         """
         Инициализация объекта Order.
 
-        :param client: Объект Client, связанный с заказом
-        :param product: Объект Product, связанный с заказом
+        :param client_id: Идентификатор клиента, оформившего заказ
+        :param product_id: Идентификатор заказанного товара
         :param quantity: Количество товаров в заказе
         """
-        self.client = client
-        self.product = product
+        self.client_id = client_id
+        self.product_id = product_id
         self.quantity = quantity
 
     def to_dict(self):
@@ -77,7 +77,46 @@ class Order:
         :return: словарь с данными заказа
         """
         return {
-            "Клиент": self.client.name,
-            "Товар": self.product.name,
+            "Клиент": self.client_id,
+            "Товар": self.product_id,
             "Количество": self.quantity
-        }
\ No newline at end of file
+        }
+
+class ChangeEvent:
+    """
+    Класс для представления изменения строки в базе данных.
+    """
+
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    def __init__(self, table, action, row_id, change_id=None):
+        """
+        Инициализация объекта ChangeEvent.
+
+        :param table: Имя изменённой таблицы
+        :param action: Тип изменения: INSERT, UPDATE или DELETE
+        :param row_id: Идентификатор изменённой строки
+        :param change_id: Номер записи в журнале изменений change_log
+        """
+        self.table = table
+        self.action = action
+        self.row_id = row_id
+        self.change_id = change_id
+
+    def to_dict(self):
+        """
+        Преобразует объект ChangeEvent в словарь для сериализации.
+
+        :return: словарь с данными изменения
+        """
+        return {
+            "change_id": self.change_id,
+            "table": self.table,
+            "action": self.action,
+            "row_id": self.row_id
+        }
+
+    def __repr__(self):
+        return f"ChangeEvent({self.table!r}, {self.action!r}, {self.row_id!r}, {self.change_id!r})"
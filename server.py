@@ -0,0 +1,473 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import urllib.request
+import urllib.error
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import networkx as nx
+from db import Database
+from models import Order, ChangeEvent
+import analysis
+import backup
+from sketches import SketchStore
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_GROUP = 256  # Максимальное количество операций в одной групповой фиксации
+GROUP_WINDOW = 0.002  # Время ожидания (сек.) дополнительных операций для групповой фиксации
+BUSY_TIMEOUT = 5000  # Время ожидания (мс) снятия блокировки базы другими процессами
+REQUEST_QUEUE_SIZE = 128  # Очередь входящих соединений сервера
+RETRIES = 3  # Повторы запроса клиентом при сбросе соединения
+
+# Операции записи: выполняются без фиксации, фиксация общая для группы
+WRITE_OPERATIONS = {
+    'add_client': lambda db, p: db.add_client(p['name'], p['email'], p['phone'], commit=False),
+    'delete_client': lambda db, p: db.delete_client(p['name'], commit=False),
+    'add_product': lambda db, p: db.add_product(p['name'], p['price'], commit=False),
+    'add_order': lambda db, p: db.add_order(Order(p['client_id'], p['product_id']), commit=False),
+    'save_cursor': lambda db, p: db.save_cursor(p['consumer'], p['change_id'], commit=False),
+    'remove_cursor': lambda db, p: db.remove_cursor(p['consumer'], commit=False),
+}
+
+# Быстрые операции чтения: выполняются рабочим потоком вместе с записью
+READ_OPERATIONS = {
+    'get_all_clients': lambda db, p: db.get_all_clients(),
+    'get_all_products': lambda db, p: db.get_all_products(),
+    'get_client': lambda db, p: db.get_client(p['client_id']),
+    'get_product': lambda db, p: db.get_product(p['product_id']),
+    'get_last_change_id': lambda db, p: db.get_last_change_id(),
+    'get_changes': lambda db, p: [event.to_dict() for event in db.get_changes(p.get('since_id', 0))],
+}
+
+# Отчёты analysis.py: выполняются отдельным потоком через собственное соединение
+# только для чтения, поэтому не задерживают запись
+REPORT_OPERATIONS = {
+    'top_clients': lambda connection, p: _frame_to_dict(analysis.top_clients(connection,
+                                                                             p.get('approximate', False))),
+    'order_trends': lambda connection, p: _frame_to_dict(analysis.order_trends(connection,
+                                                                               p.get('approximate', False))),
+    'distinct_clients': lambda connection, p: _frame_to_dict(analysis.distinct_clients(connection,
+                                                                                       p.get('approximate', False))),
+    'client_network': lambda connection, p: _graph_to_dict(analysis.client_network(connection,
+                                                                                   p.get('approximate', False))),
+}
+
+# Резервное копирование: выполняется в отдельном потоке через собственное соединение,
+# файлы создаются только в каталоге снимков сервера
+BACKUP_OPERATIONS = {
+    'create_snapshot': lambda server, p: os.path.basename(backup.snapshot_file(server.db_file,
+                                                                               server.snapshot_dir)),
+}
+
+
+class ServerError(Exception):
+    """Ошибка, возвращённая сервером при выполнении операции."""
+
+
+def _frame_to_dict(df):
+    """Преобразует DataFrame в словарь, пригодный для JSON."""
+    return json.loads(df.to_json(orient='split'))
+
+
+def _graph_to_dict(G):
+    """Преобразует граф в словарь, пригодный для JSON."""
+    return {'nodes': list(G.nodes()), 'edges': [list(edge) for edge in G.edges()], 'graph': dict(G.graph)}
+
+
+def _graph_from_dict(data):
+    """Восстанавливает граф из словаря, полученного от сервера."""
+    G = nx.Graph(**data.get('graph', {}))
+    G.add_nodes_from(data['nodes'])
+    G.add_edges_from(data['edges'])
+    return G
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    """HTTP-сервер с увеличенной очередью входящих соединений."""
+
+    request_queue_size = REQUEST_QUEUE_SIZE
+    daemon_threads = True
+
+
+class OrderServer:
+    """
+    Сервер, единолично владеющий базой данных и обслуживающий клиентов по HTTP JSON API.
+
+    Запись и быстрые операции чтения выполняются одним рабочим потоком. Операции
+    записи, поступившие одновременно от разных клиентов, объединяются в одну
+    транзакцию (групповая фиксация), поэтому клиенты не получают ошибку
+    "database is locked".
+
+    Отчёты строятся отдельным потоком через соединение только для чтения,
+    а резервные копии — ещё одним потоком и только в каталоге snapshot_dir,
+    поэтому ни отчёты, ни копирование не останавливают запись.
+
+    Протокол: POST /rpc с телом {"op": имя, "params": {...}} или списком таких
+    объектов (пакет, выполняемый в одной транзакции). Ответ: {"result": ...} или
+    {"error": сообщение}, для пакета — список ответов.
+    """
+
+    def __init__(self, db_file='orders.db', host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 snapshot_dir=backup.SNAPSHOT_DIR, busy_timeout=BUSY_TIMEOUT):
+        """
+        Инициализация сервера.
+
+        :param db_file: Путь к файлу базы данных
+        :param host: Адрес, на котором принимаются запросы
+        :param port: Порт (0 — выбрать свободный)
+        :param snapshot_dir: Каталог сервера для резервных копий и снимков
+        :param busy_timeout: Время ожидания (мс) снятия блокировки базы
+        """
+        self.db_file = db_file
+        self.snapshot_dir = snapshot_dir
+        self.busy_timeout = busy_timeout
+        self.requests = queue.Queue()
+        self.backup_executor = ThreadPoolExecutor(max_workers=1)
+        self.report_executor = ThreadPoolExecutor(max_workers=1)
+        self.report_connection = None  # Соединение потока отчётов, открывается при первом отчёте
+        self.httpd = _HTTPServer((host, port), self._make_handler())
+        self.ready = threading.Event()  # Рабочий поток открыл базу данных
+        self.startup_error = None
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.http_thread = None
+        self.worker.start()
+
+    @property
+    def url(self):
+        """Адрес сервера для RemoteDatabase."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def submit(self, operations):
+        """
+        Ставит пакет операций в очередь рабочего потока.
+
+        :param operations: список пар (имя операции, параметры)
+        :return: список объектов Future с результатами
+        """
+        for name, params in operations:
+            if (name not in WRITE_OPERATIONS and name not in READ_OPERATIONS
+                    and name not in REPORT_OPERATIONS and name not in BACKUP_OPERATIONS):
+                raise ServerError(f"Неизвестная операция: {name}")
+        futures = []
+        group = []
+        for name, params in operations:
+            if name in BACKUP_OPERATIONS:
+                futures.append(self.backup_executor.submit(BACKUP_OPERATIONS[name], self, params or {}))
+            elif name in REPORT_OPERATIONS:
+                futures.append(self.report_executor.submit(self._run_report, name, params or {}))
+            else:
+                future = Future()
+                futures.append(future)
+                group.append(((name, params), future))
+        if group:
+            self.requests.put(group)
+        return futures
+
+    def _work(self):
+        """Рабочий поток: выполняет операции группами с одной фиксацией на группу."""
+        try:
+            db = Database(self.db_file)
+            db.connection.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout)}')
+            SketchStore.attach(db)
+        except Exception as e:
+            self.startup_error = e
+            return
+        finally:
+            self.ready.set()
+        while True:
+            group = self.requests.get()
+            if group is None:
+                break
+            try:
+                while len(group) < MAX_GROUP:
+                    more = self.requests.get(timeout=GROUP_WINDOW)
+                    if more is None:
+                        self.requests.put(None)
+                        break
+                    group.extend(more)
+            except queue.Empty:
+                pass
+            self._run_group(db, group)
+        SketchStore.detach(db)
+        db.close()
+
+    def _run_report(self, name, params):
+        """Строит отчёт в потоке отчётов через собственное соединение только для чтения."""
+        if self.report_connection is None:
+            uri = 'file:{}?mode=ro'.format(os.path.abspath(self.db_file).replace('?', '%3f'))
+            self.report_connection = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout / 1000)
+            SketchStore.attach_reader(self.report_connection)
+        return REPORT_OPERATIONS[name](self.report_connection, params)
+
+    def _close_report_connection(self):
+        """Закрывает соединение потока отчётов."""
+        if self.report_connection is not None:
+            SketchStore.detach_reader(self.report_connection)
+            self.report_connection.close()
+            self.report_connection = None
+
+    def _run_group(self, db, group):
+        """
+        Выполняет группу операций в одной транзакции.
+
+        Ошибка отдельной операции откатывает только её (SAVEPOINT). Если не удалось
+        начать или зафиксировать транзакцию, откатывается вся группа, а ошибка
+        передаётся всем операциям группы; рабочий поток продолжает работу.
+        """
+        connection = db.connection
+        done = []
+        try:
+            if not connection.in_transaction:
+                connection.execute('BEGIN')
+            for (name, params), future in group:
+                try:
+                    if name in WRITE_OPERATIONS:
+                        connection.execute('SAVEPOINT operation')
+                        pending = len(db.pending_events)
+                        try:
+                            result = WRITE_OPERATIONS[name](db, params or {})
+                        except Exception:
+                            connection.execute('ROLLBACK TO operation')
+                            del db.pending_events[pending:]
+                            raise
+                        finally:
+                            connection.execute('RELEASE operation')
+                    else:
+                        result = READ_OPERATIONS[name](db, params or {})
+                    done.append((future, result, None))
+                except Exception as e:
+                    done.append((future, None, e))
+            db.commit()
+        except Exception as e:
+            try:
+                db.rollback()
+            except Exception as rollback_error:
+                print(f"Ошибка при откате транзакции: {rollback_error}")
+            done = [(future, None, e) for _, future in group]
+        for future, result, error in done:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _make_handler(self):
+        """Создаёт класс обработчика HTTP-запросов, связанный с сервером."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != '/rpc':
+                    self.send_error(404)
+                    return
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    single = isinstance(body, dict)
+                    requests = [body] if single else body
+                    futures = server.submit([(r['op'], r.get('params')) for r in requests])
+                except Exception as e:
+                    self._reply(400, {'error': str(e)})
+                    return
+                replies = []
+                for future in futures:
+                    try:
+                        replies.append({'result': future.result()})
+                    except Exception as e:
+                        replies.append({'error': str(e)})
+                self._reply(200, replies[0] if single else replies)
+
+            def _reply(self, status, data):
+                payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _wait_ready(self):
+        """Дожидается открытия базы данных рабочим потоком."""
+        self.ready.wait()
+        if self.startup_error is not None:
+            raise ServerError(f"Не удалось открыть базу данных: {self.startup_error}")
+
+    def start(self):
+        """Запускает обработку HTTP-запросов в фоновом потоке."""
+        self._wait_ready()
+        self.http_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.http_thread.start()
+        return self
+
+    def serve_forever(self):
+        """Обрабатывает HTTP-запросы в текущем потоке до остановки сервера."""
+        self._wait_ready()
+        print(f"Сервер заказов запущен: {self.url}")
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        """Останавливает сервер и закрывает базу данных."""
+        if self.http_thread is not None:
+            self.httpd.shutdown()
+        self.httpd.server_close()
+        self.requests.put(None)
+        self.worker.join()
+        self.backup_executor.shutdown()
+        self.report_executor.submit(self._close_report_connection).result()
+        self.report_executor.shutdown()
+
+
+class RemoteDatabase:
+    """
+    Клиент сервера заказов с тем же интерфейсом, что и Database.
+
+    Прямого соединения с SQLite нет (connection = None), отчёты analysis.py
+    строятся на сервере методом report().
+    """
+
+    connection = None
+
+    def __init__(self, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=30):
+        """
+        Инициализация клиента.
+
+        :param url: Адрес сервера
+        :param timeout: Таймаут запроса в секундах
+        """
+        self.url = url.rstrip('/') + '/rpc'
+        self.timeout = timeout
+
+    def _post(self, body):
+        """
+        Отправляет запрос серверу и возвращает разобранный ответ.
+
+        При сбросе соединения (например, переполнена очередь соединений сервера)
+        запрос повторяется до RETRIES раз с растущей паузой.
+        """
+        data = json.dumps(body).encode('utf-8')
+        for attempt in range(RETRIES + 1):
+            request = urllib.request.Request(self.url, data=data, headers={'Content-Type': 'application/json'})
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                raise ServerError(json.loads(e.read()).get('error', str(e)))
+            except (urllib.error.URLError, ConnectionError) as e:
+                reason = getattr(e, 'reason', e)
+                if attempt == RETRIES or not isinstance(reason, ConnectionError):
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
+
+    def call(self, operation, **params):
+        """Выполняет одну операцию на сервере."""
+        reply = self._post({'op': operation, 'params': params})
+        if 'error' in reply:
+            raise ServerError(reply['error'])
+        return reply['result']
+
+    def batch(self, operations):
+        """
+        Выполняет пакет операций в одной транзакции сервера.
+
+        :param operations: список пар (имя операции, параметры)
+        :return: список результатов; для неудачных операций — объект ServerError
+        """
+        replies = self._post([{'op': name, 'params': params} for name, params in operations])
+        return [ServerError(reply['error']) if 'error' in reply else reply['result'] for reply in replies]
+
+    def add_client(self, name, email, phone):
+        """Добавляет клиента в базу данных."""
+        return self.call('add_client', name=name, email=email, phone=phone)
+
+    def delete_client(self, name):
+        """Удаляет клиента из базы данных по имени."""
+        self.call('delete_client', name=name)
+
+    def get_all_clients(self):
+        """Получает всех клиентов из базы данных."""
+        return [tuple(row) for row in self.call('get_all_clients')]
+
+    def add_product(self, name, price):
+        """Добавляет продукт в базу данных."""
+        return self.call('add_product', name=name, price=price)
+
+    def get_all_products(self):
+        """Получает все продукты из базы данных."""
+        return [tuple(row) for row in self.call('get_all_products')]
+
+    def add_order(self, order):
+        """Добавляет заказ в базу данных."""
+        return self.call('add_order', client_id=order.client_id, product_id=order.product_id)
+
+    def get_client(self, client_id):
+        """Получает клиента по идентификатору."""
+        row = self.call('get_client', client_id=client_id)
+        return tuple(row) if row else None
+
+    def get_product(self, product_id):
+        """Получает продукт по идентификатору."""
+        row = self.call('get_product', product_id=product_id)
+        return tuple(row) if row else None
+
+    def get_last_change_id(self):
+        """Возвращает номер последней записи в журнале изменений сервера."""
+        return self.call('get_last_change_id')
+
+    def get_changes(self, since_id=0):
+        """Получает изменения из журнала сервера после since_id."""
+        return [ChangeEvent(e['table'], e['action'], e['row_id'], e['change_id'])
+                for e in self.call('get_changes', since_id=since_id)]
+
+    def save_cursor(self, consumer, change_id):
+        """Запоминает на сервере, до какого изменения журнал прочитан читателем consumer."""
+        self.call('save_cursor', consumer=consumer, change_id=change_id)
+
+    def remove_cursor(self, consumer):
+        """Удаляет на сервере курсор читателя журнала."""
+        self.call('remove_cursor', consumer=consumer)
+
+    def create_snapshot(self, progress=None):
+        """Создаёт резервную копию в каталоге снимков сервера и возвращает имя её файла."""
+        return self.call('create_snapshot')
+
+    def report(self, name, approximate=False):
+        """
+        Строит отчёт analysis.py на сервере.
+
+        :param name: 'top_clients', 'order_trends', 'distinct_clients' или 'client_network'
+        :param approximate: Строить приближённый отчёт по скетчам
+        :return: pandas.DataFrame или networkx.Graph для client_network
+        """
+        data = self.call(name, approximate=approximate)
+        if name == 'client_network':
+            return _graph_from_dict(data)
+        return pd.DataFrame(data['data'], columns=data['columns'])
+
+    def close(self):
+        """Соединение с сервером не удерживается, закрывать нечего."""
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сервер заказов поверх orders.db")
+    parser.add_argument('db_file', nargs='?', default='orders.db', help="Файл базы данных")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Адрес сервера")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Порт сервера")
+    args = parser.parse_args()
+
+    server = OrderServer(args.db_file, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
@@ -0,0 +1,570 @@
+import base64
+import hashlib
+import json
+import math
+import random
+import sqlite3
+import pandas as pd
+import networkx as nx
+
+TOP_K_CAPACITY = 100  # Количество счётчиков Space-Saving
+HLL_PRECISION = 10  # 2**10 регистров, относительная ошибка около 3%
+HLL_SPARSE_DIVISOR = 32  # Разреженное хранение, пока заполнено не больше 1/32 регистров
+RESERVOIR_SIZE = 10000  # Размер выборки заказов
+Z_95 = 1.96  # Квантиль нормального распределения для 95% доверительного интервала
+
+
+def _hash64(value):
+    """Возвращает устойчивый между запусками 64-битный хеш значения."""
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class SpaceSaving:
+    """
+    Скетч Space-Saving для поиска самых частых значений (top-K).
+
+    Оценка частоты каждого значения завышена не более чем на error и не более
+    чем на total / capacity.
+    """
+
+    def __init__(self, capacity=TOP_K_CAPACITY, counters=None, total=0):
+        """
+        Инициализация скетча.
+
+        :param capacity: Количество счётчиков
+        :param counters: Словарь {значение: [оценка, ошибка]}
+        :param total: Количество учтённых значений
+        """
+        self.capacity = capacity
+        self.counters = counters or {}
+        self.total = total
+
+    def add(self, key):
+        """Учитывает одно появление значения."""
+        self.total += 1
+        if key in self.counters:
+            self.counters[key][0] += 1
+        elif len(self.counters) < self.capacity:
+            self.counters[key] = [1, 0]
+        else:
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            count = self.counters.pop(victim)[0]
+            self.counters[key] = [count + 1, count]
+
+    def top(self):
+        """Возвращает список (значение, оценка, ошибка) по убыванию оценки."""
+        return sorted(((key, count, error) for key, (count, error) in self.counters.items()),
+                      key=lambda item: item[1], reverse=True)
+
+    def to_dict(self):
+        """Преобразует скетч в словарь для сохранения."""
+        return {'capacity': self.capacity, 'total': self.total,
+                'counters': [[key, count, error] for key, (count, error) in self.counters.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Восстанавливает скетч из словаря."""
+        counters = {key: [count, error] for key, count, error in data['counters']}
+        return cls(data['capacity'], counters, data['total'])
+
+
+class HyperLogLog:
+    """
+    Скетч HyperLogLog для оценки количества различных значений.
+
+    Стандартная относительная ошибка оценки равна 1.04 / sqrt(2 ** precision).
+    Пока заполнено мало регистров, они хранятся разреженно (словарь
+    {номер: значение}), поэтому скетч для редкой пары (товар, день) занимает
+    десятки байт вместо 2 ** precision.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, registers=None, sparse=None):
+        """
+        Инициализация скетча.
+
+        :param precision: Число бит хеша, выбирающих регистр
+        :param registers: Сохранённые плотные регистры
+        :param sparse: Сохранённые разреженные регистры {номер: значение}
+        """
+        self.precision = precision
+        self.registers = bytearray(registers) if registers else None
+        self.sparse = None if self.registers is not None else dict(sparse or {})
+
+    def _densify(self):
+        """Переводит разреженные регистры в плотный массив."""
+        self.registers = bytearray(1 << self.precision)
+        for index, rank in self.sparse.items():
+            self.registers[index] = rank
+        self.sparse = None
+
+    def add(self, value):
+        """Учитывает значение."""
+        h = _hash64(value)
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if self.sparse is not None:
+            if rank > self.sparse.get(index, 0):
+                self.sparse[index] = rank
+                if len(self.sparse) > (1 << self.precision) // HLL_SPARSE_DIVISOR:
+                    self._densify()
+        elif rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Объединяет скетч с другим скетчем той же точности."""
+        if self.sparse is not None:
+            self._densify()
+        if other.sparse is not None:
+            for index, rank in other.sparse.items():
+                self.registers[index] = max(self.registers[index], rank)
+        else:
+            self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def estimate(self):
+        """Возвращает оценку количества различных значений."""
+        m = 1 << self.precision
+        if self.sparse is not None:
+            zeros = m - len(self.sparse)
+            total = zeros + sum(2.0 ** -rank for rank in self.sparse.values())
+        else:
+            zeros = self.registers.count(0)
+            total = sum(2.0 ** -register for register in self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / total
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return raw
+
+    def relative_error(self):
+        """Возвращает стандартную относительную ошибку оценки."""
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def to_dict(self):
+        """Преобразует скетч в словарь для сохранения."""
+        if self.sparse is not None:
+            return {'precision': self.precision, 'sparse': [[index, rank] for index, rank in self.sparse.items()]}
+        return {'precision': self.precision, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Восстанавливает скетч из словаря."""
+        if 'sparse' in data:
+            return cls(data['precision'], sparse={index: rank for index, rank in data['sparse']})
+        return cls(data['precision'], base64.b64decode(data['registers']))
+
+
+class Reservoir:
+    """
+    Равномерная выборка фиксированного размера из потока (reservoir sampling).
+    """
+
+    def __init__(self, size=RESERVOIR_SIZE, items=None, seen=0):
+        """
+        Инициализация выборки.
+
+        :param size: Размер выборки
+        :param items: Сохранённые элементы выборки
+        :param seen: Количество элементов, прошедших через выборку
+        """
+        self.size = size
+        self.items = items or []
+        self.seen = seen
+        self.dirty = set()  # Изменённые ячейки выборки
+        self.random = random.Random()
+
+    def add(self, item):
+        """Учитывает элемент потока."""
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            self.dirty.add(len(self.items) - 1)
+        else:
+            slot = self.random.randrange(self.seen)
+            if slot < self.size:
+                self.items[slot] = item
+                self.dirty.add(slot)
+
+
+# Скетчи, подключённые к соединениям через SketchStore.attach (ключ — id соединения)
+_attached = {}
+
+# Части набора скетчей: отчёт загружает только нужную ему часть
+PARTS = ('top_clients', 'reservoir', 'distinct')
+
+
+class SketchStore:
+    """
+    Набор скетчей по таблице заказов для приближённой аналитики.
+
+    Скетчи обновляются инкрементально по новым заказам (orders.id больше
+    отметки) и сохраняются в таблицы sketches и sketch_samples базы данных.
+    Части набора (PARTS) загружаются по отдельности и догоняют заказы
+    каждая от своей отметки.
+
+    Сохранённый набор имеет номер версии. Если скетчи сохраняют несколько
+    процессов (например, два приложения с общей базой), процесс, чья версия
+    устарела, перед записью заменяет свой набор сохранённым, поэтому в базе
+    всегда один согласованный набор, а не смесь выборок разных процессов.
+
+    День заказа — DATE(orders.order_date), как и в точных отчётах analysis.py.
+    Заказы без даты (созданные до появления журнала изменений) учитываются
+    в топе клиентов и сети клиентов, но не в отчётах по дням.
+    """
+
+    def __init__(self, connection):
+        """
+        Инициализация пустого набора скетчей.
+
+        :param connection: Соединение с базой данных
+        """
+        self.connection = connection
+        self.version = None  # Версия сохранённого набора, из которой загружены части
+        self._reset()
+
+    def _reset(self):
+        """Забывает загруженные части набора."""
+        self.cursors = {}  # Номер последнего учтённого заказа по загруженным частям
+        self.top_clients_sketch = None
+        self.reservoir = None
+        self.distinct = None  # HyperLogLog по ключу (product_id, order_date)
+        self.dirty = set()  # Изменённые ключи distinct
+
+    @classmethod
+    def for_connection(cls, connection, part):
+        """
+        Возвращает набор скетчей соединения с загруженной и догнанной частью part.
+
+        Если к соединению подключён набор (attach), используется он без повторной
+        загрузки; иначе из базы читается только нужная часть.
+
+        :param connection: Соединение с базой данных (или со снимком)
+        :param part: Часть набора: 'top_clients', 'reservoir' или 'distinct'
+        :return: SketchStore
+        """
+        store = _attached.get(id(connection))
+        if store is None or store.connection is not connection:
+            store = cls(connection)
+        store.ensure(part)
+        store.update()
+        return store
+
+    @classmethod
+    def load(cls, connection):
+        """
+        Загружает из базы все части набора и догоняет их по новым заказам.
+
+        :param connection: Соединение с базой данных (или со снимком)
+        :return: SketchStore
+        """
+        store = cls(connection)
+        store._ensure_all()
+        store.update()
+        return store
+
+    def _read(self, queries):
+        """Выполняет запросы чтения в одной транзакции, чтобы данные были согласованы."""
+        started = not self.connection.in_transaction
+        if started:
+            self.connection.execute('BEGIN')
+        try:
+            return [self.connection.execute(query).fetchall() for query in queries]
+        finally:
+            if started:
+                self.connection.rollback()
+
+    def ensure(self, part):
+        """
+        Загружает часть набора из базы; если скетчи ещё не сохранялись,
+        строит весь набор полным проходом по заказам.
+
+        :param part: Часть набора
+        """
+        if part in self.cursors:
+            return
+        queries = ["SELECT data FROM sketches WHERE name = 'state'"]
+        if part == 'top_clients':
+            queries.append("SELECT data FROM sketches WHERE name = 'top_clients'")
+        elif part == 'distinct':
+            queries.append("SELECT name, data FROM sketches WHERE name LIKE 'hll:%'")
+        else:
+            queries.append("SELECT order_id, client_id, product_id, order_date FROM sketch_samples ORDER BY slot")
+        try:
+            state, rows = self._read(queries)
+        except sqlite3.Error:
+            state, rows = [], []
+        state = json.loads(state[0][0]) if state else {}
+        if 'last_order_id' not in state:
+            self.rebuild()  # Скетчи не сохранялись или сохранены в старом формате
+            return
+        if self.cursors and state.get('version', 0) != self.version:
+            self._reset()  # Набор сохранил другой процесс: все части загружаются из одной версии
+        self.version = state.get('version', 0)
+
+        if part == 'top_clients':
+            self.top_clients_sketch = SpaceSaving.from_dict(json.loads(rows[0][0]))
+        elif part == 'distinct':
+            self.distinct = {}
+            for name, data in rows:
+                product_id, day = json.loads(name[4:])
+                self.distinct[(product_id, day)] = HyperLogLog.from_dict(json.loads(data))
+        else:
+            self.reservoir = Reservoir(state['reservoir_size'], [list(row) for row in rows], state['seen'])
+        self.cursors[part] = state['last_order_id']
+
+    def _ensure_all(self):
+        """Загружает все части набора из одной сохранённой версии."""
+        while len(self.cursors) < len(PARTS):
+            for part in PARTS:
+                self.ensure(part)
+
+    def _add_order(self, parts, order_id, client_id, product_id, day):
+        """Учитывает один заказ в указанных частях набора."""
+        if 'top_clients' in parts:
+            self.top_clients_sketch.add(client_id)
+        if 'reservoir' in parts:
+            self.reservoir.add([order_id, client_id, product_id, day])
+        if 'distinct' in parts and day is not None:
+            key = (product_id, day)
+            if key not in self.distinct:
+                self.distinct[key] = HyperLogLog()
+            self.distinct[key].add(client_id)
+            self.dirty.add(key)
+
+    def rebuild(self):
+        """
+        Строит все части набора заново полным проходом по таблице заказов.
+
+        Если соединение допускает запись, результат сразу сохраняется, чтобы
+        следующие отчёты не повторяли полный проход.
+        """
+        self.top_clients_sketch = SpaceSaving()
+        self.reservoir = Reservoir()
+        self.distinct = {}
+        self.dirty = set()
+        row = self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()
+        self.cursors = {part: row[0] for part in PARTS}
+        query = """
+        SELECT id, client_id, product_id, DATE(order_date)
+        FROM orders
+        WHERE id <= ?
+        ORDER BY id
+        """
+        for order in self.connection.execute(query, (row[0],)):
+            self._add_order(PARTS, *order)
+        try:
+            self.save(replace=True)
+        except sqlite3.Error:
+            self.connection.rollback()  # Снимок только для чтения: скетчи остаются в памяти
+
+    def update(self):
+        """
+        Учитывает заказы, добавленные после последнего учтённого заказа.
+
+        Номера заказов (AUTOINCREMENT) растут в порядке фиксации, поэтому
+        новые заказы — это заказы с id больше отметки.
+
+        :return: количество учтённых заказов
+        """
+        if not self.cursors:
+            return 0
+        query = """
+        SELECT id, client_id, product_id, DATE(order_date)
+        FROM orders
+        WHERE id > ?
+        ORDER BY id
+        """
+        count = 0
+        for order in self.connection.execute(query, (min(self.cursors.values()),)).fetchall():
+            parts = [part for part, cursor in self.cursors.items() if order[0] > cursor]
+            self._add_order(parts, *order)
+            for part in parts:
+                self.cursors[part] = order[0]
+            count += 1
+        return count
+
+    def save(self, replace=False):
+        """
+        Сохраняет изменённые скетчи в базу данных (загружая недостающие части).
+
+        Версия сохранённого набора перечитывается в той же транзакции записи.
+        Если набор после загрузки сохранил другой процесс, собственные части
+        заменяются сохранёнными и догоняют новые заказы, и только затем
+        записываются.
+
+        :param replace: Удалить ранее сохранённые скетчи (после полного прохода rebuild)
+        """
+        started = not self.connection.in_transaction
+        if started:
+            self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.connection.execute("SELECT data FROM sketches WHERE name = 'state'").fetchone()
+            saved = json.loads(row[0]) if row else {}
+            if 'last_order_id' in saved and saved.get('version', 0) != self.version:
+                self._reset()
+                replace = False
+            self._ensure_all()
+            self.update()
+            self.version = saved.get('version', 0) + 1
+            state = {'version': self.version, 'last_order_id': min(self.cursors.values()),
+                     'seen': self.reservoir.seen, 'reservoir_size': self.reservoir.size}
+            rows = [('state', state), ('top_clients', self.top_clients_sketch.to_dict())]
+            rows += [('hll:' + json.dumps(list(key)), self.distinct[key].to_dict()) for key in self.dirty]
+            cur = self.connection.cursor()
+            if replace:
+                cur.execute("DELETE FROM sketches")
+                cur.execute("DELETE FROM sketch_samples")
+            cur.executemany("INSERT OR REPLACE INTO sketches(name, data) VALUES(?,?)",
+                            [(name, json.dumps(data)) for name, data in rows])
+            cur.executemany("""INSERT OR REPLACE INTO sketch_samples(slot, order_id, client_id, product_id, order_date)
+                               VALUES(?,?,?,?,?)""",
+                            [(slot, *self.reservoir.items[slot]) for slot in sorted(self.reservoir.dirty)])
+            self.connection.commit()
+        except Exception:
+            if started:
+                self.connection.rollback()
+            raise
+        self.dirty.clear()
+        self.reservoir.dirty.clear()
+
+    def on_change(self, event):
+        """Обработчик события добавления заказа: обновляет и сохраняет скетчи."""
+        if self.update():
+            self.save()
+
+    @classmethod
+    def attach(cls, db):
+        """
+        Загружает скетчи базы данных, подписывает их на добавление заказов
+        и подключает к соединению, чтобы отчёты использовали их без загрузки.
+
+        :param db: Объект Database
+        :return: SketchStore
+        """
+        store = cls.load(db.connection)
+        store.save()
+        db.subscribe(store.on_change, 'orders')
+        _attached[id(db.connection)] = store
+        return store
+
+    @classmethod
+    def detach(cls, db):
+        """
+        Отключает скетчи от базы данных.
+
+        :param db: Объект Database
+        """
+        store = _attached.pop(id(db.connection), None)
+        if store is not None:
+            db.unsubscribe(store.on_change)
+
+    @classmethod
+    def attach_reader(cls, connection):
+        """
+        Подключает к соединению, по которому только строятся отчёты, набор скетчей
+        без сохранения: части загружаются при первом отчёте и дальше догоняют
+        новые заказы в памяти.
+
+        :param connection: Соединение с базой данных (например, только для чтения)
+        :return: SketchStore
+        """
+        store = cls(connection)
+        _attached[id(connection)] = store
+        return store
+
+    @classmethod
+    def detach_reader(cls, connection):
+        """
+        Отключает скетчи от соединения, подключённые attach_reader.
+
+        :param connection: Соединение с базой данных
+        """
+        _attached.pop(id(connection), None)
+
+    def _scale(self):
+        """Возвращает (размер выборки, количество заказов)."""
+        return len(self.reservoir.items), self.reservoir.seen
+
+    def top_clients(self, limit=5):
+        """
+        Приближённый топ клиентов по количеству заказов.
+
+        :return: DataFrame с колонками name, order_count, error_bound
+                 (истинное количество лежит в [order_count - error_bound, order_count])
+        """
+        top = self.top_clients_sketch.top()
+        ids = [key for key, _, _ in top]
+        names = dict(self.connection.execute(
+            f"SELECT id, name FROM clients WHERE id IN ({', '.join('?' * len(ids))})", ids).fetchall())
+        df = pd.DataFrame([(names[key], count, error) for key, count, error in top if key in names],
+                          columns=['name', 'order_count', 'error_bound'])
+        df = df.groupby('name', as_index=False).sum()
+        return df.sort_values('order_count', ascending=False, kind='stable').head(limit).reset_index(drop=True)
+
+    def order_trends(self):
+        """
+        Приближённая динамика заказов по выборке.
+
+        :return: DataFrame с колонками order_date, order_count, error_bound
+                 (полуширина 95% доверительного интервала)
+        """
+        k, n = self._scale()
+        df = pd.DataFrame(self.reservoir.items, columns=['order_id', 'client_id', 'product_id', 'order_date'])
+        counts = df.groupby('order_date').size()  # Заказы без даты не попадают в отчёт, но входят в n
+        p = counts / max(k, 1)
+        correction = (n - k) / max(n - 1, 1)
+        return pd.DataFrame({
+            'order_date': counts.index,
+            'order_count': (p * n).round().astype('int64').to_numpy(),
+            'error_bound': (Z_95 * n * (p * (1 - p) / max(k, 1) * correction) ** 0.5).to_numpy(),
+        })
+
+    def client_network(self):
+        """
+        Приближённая сеть клиентов по выборке заказов.
+
+        В граф попадают только существующие связи, но часть связей теряется.
+        Связь найдена, если в выборку попали оба заказа хотя бы одной пары,
+        которая её образует. Для связи из одной пары заказов это происходит
+        с вероятностью k(k-1) / (n(n-1)), то есть примерно (k/n)**2; связи
+        с большим числом пар находятся чаще. Оценки записаны в G.graph:
+
+        - sample_fraction — доля заказов в выборке;
+        - edge_recall_lower_bound — нижняя граница вероятности найти любую связь;
+        - edges_estimate — оценка числа связей в полном графе: найденные связи,
+          делённые на нижнюю границу вероятности. Это ожидаемое значение, а не
+          граница: связи из многих пар находятся чаще, поэтому оценка обычно завышена.
+
+        Вес ребра (weight) — число пар заказов выборки, подтверждающих связь.
+        """
+        k, n = self._scale()
+        clients_by_product = {}
+        for _, client_id, product_id, _ in self.reservoir.items:
+            clients_by_product.setdefault(product_id, []).append(client_id)
+        names = dict(self.connection.execute("SELECT id, name FROM clients").fetchall())
+        recall = k * (k - 1) / (n * (n - 1)) if n > k else 1.0
+        G = nx.Graph(sample_fraction=k / n if n else 1.0, edge_recall_lower_bound=recall)
+        for clients in clients_by_product.values():
+            clients = [names[client_id] for client_id in clients if client_id in names]
+            for i, a in enumerate(clients):
+                for b in clients[i + 1:]:
+                    if a != b:
+                        weight = G[a][b]['weight'] + 1 if G.has_edge(a, b) else 1
+                        G.add_edge(a, b, weight=weight)
+        nodes = len(names)
+        G.graph['edges_estimate'] = min(G.number_of_edges() / recall if recall else 0,
+                                        nodes * (nodes - 1) / 2)
+        return G
+
+    def distinct_clients(self):
+        """
+        Приближённое количество различных клиентов по товарам и дням.
+
+        :return: DataFrame с колонками product_id, order_date, distinct_clients, error_bound
+                 (полуширина 95% доверительного интервала)
+        """
+        rows = []
+        for (product_id, day), sketch in sorted(self.distinct.items(), key=lambda item: str(item[0])):
+            estimate = sketch.estimate()
+            rows.append((product_id, day, round(estimate), Z_95 * sketch.relative_error() * estimate))
+        return pd.DataFrame(rows, columns=['product_id', 'order_date', 'distinct_clients', 'error_bound'])
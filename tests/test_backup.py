@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import backup
+from db import Database
+
+
+class BackupTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp.name, 'orders.db')
+        self.target_file = os.path.join(self.tmp.name, 'backup.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fill(self, connection, rows=200):
+        """Заполняет базу строками на несколько десятков страниц."""
+        connection.execute('CREATE TABLE IF NOT EXISTS notes (id INTEGER PRIMARY KEY, text TEXT)')
+        connection.executemany('INSERT INTO notes(text) VALUES(?)', [('x' * 1000,)] * rows)
+        connection.commit()
+
+    def count(self, path):
+        connection = sqlite3.connect(path)
+        try:
+            return connection.execute('SELECT COUNT(*) FROM notes').fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_progress_is_reported_by_steps(self):
+        db = Database(self.db_file)
+        try:
+            self.fill(db.connection)
+        finally:
+            db.close()
+        calls = []
+        backup.backup_file(self.db_file, self.target_file, pages=4, sleep=0,
+                           progress=lambda copied, total: calls.append((copied, total)))
+        self.assertGreater(len(calls), 1)
+        self.assertEqual([copied for copied, _ in calls], sorted(copied for copied, _ in calls))
+        self.assertEqual(calls[-1][0], calls[-1][1])
+        self.assertEqual(self.count(self.target_file), 200)
+
+    def test_wal_copy_is_point_in_time(self):
+        db = Database(self.db_file)
+        writer = sqlite3.connect(self.db_file)
+        try:
+            self.fill(db.connection)
+            backup.backup_file(self.db_file, self.target_file, pages=4, sleep=0,
+                               progress=lambda copied, total: self.fill(writer, rows=1))
+        finally:
+            writer.close()
+            db.close()
+        self.assertEqual(self.count(self.target_file), 200)
+        self.assertGreater(self.count(self.db_file), 200)
+
+    def test_restarts_fall_back_to_single_step(self):
+        source = sqlite3.connect(self.db_file)
+        writer = sqlite3.connect(self.db_file)
+        self.assertEqual(source.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        self.fill(source)
+        calls = []
+
+        def progress(copied, total):
+            calls.append((copied, total))
+            if copied < total:
+                self.fill(writer, rows=1)  # Запись другим соединением начинает копирование заново
+
+        try:
+            backup.backup_database(source, self.target_file, pages=4, sleep=0, progress=progress)
+        finally:
+            writer.close()
+            source.close()
+        restarts = sum(1 for (a, _), (b, _) in zip(calls, calls[1:]) if b <= a < calls[-1][1])
+        self.assertEqual(restarts, backup.MAX_RESTARTS)
+        self.assertEqual(calls[-1][0], calls[-1][1])
+        self.assertEqual(self.count(self.target_file), self.count(self.db_file))
+
+    def test_snapshot_is_opened_read_only(self):
+        db = Database(self.db_file)
+        try:
+            self.fill(db.connection)
+            snapshot_dir = os.path.join(self.tmp.name, 'snapshots')
+            path = backup.snapshot_file(self.db_file, snapshot_dir)
+        finally:
+            db.close()
+        self.assertEqual(backup.list_snapshots(snapshot_dir), [path])
+        connection = backup.open_snapshot(path)
+        try:
+            self.assertEqual(connection.execute('SELECT COUNT(*) FROM notes').fetchone()[0], 200)
+            with self.assertRaises(sqlite3.OperationalError):
+                connection.execute("INSERT INTO notes(text) VALUES('y')")
+        finally:
+            connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
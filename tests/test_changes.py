@@ -0,0 +1,165 @@
+import os
+import tempfile
+import unittest
+import gui
+from db import Database
+from models import ChangeEvent
+
+
+class FakeList:
+    """Список вместо виджета Listbox или Text."""
+
+    def __init__(self):
+        self.items = []
+
+    def insert(self, index, value):
+        self.items.insert(len(self.items) if index == gui.tk.END else index, value)
+
+    def delete(self, first, last=None):
+        del self.items[first:len(self.items) if last == gui.tk.END else first + 1]
+
+
+class FakeRoot:
+    """Главное окно, запоминающее отложенные вызовы."""
+
+    def __init__(self):
+        self.calls = []
+
+    def after(self, delay, callback, *args):
+        self.calls.append(callback)
+
+
+class DatabaseChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'orders.db'))
+        self.events = []
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_events_are_delivered_after_commit(self):
+        self.db.subscribe(self.events.append)
+        client_id = self.db.add_client('Иван', 'ivan@mail.ru', '1', commit=False)
+        self.assertEqual(self.events, [])
+        self.db.commit()
+        self.assertEqual([(e.table, e.action, e.row_id) for e in self.events],
+                         [('clients', ChangeEvent.INSERT, client_id)])
+        self.assertEqual(self.events[0].change_id, self.db.get_last_change_id())
+
+    def test_events_are_dropped_on_rollback(self):
+        self.db.subscribe(self.events.append)
+        self.db.add_client('Иван', 'ivan@mail.ru', '1', commit=False)
+        self.db.rollback()
+        self.db.commit()
+        self.assertEqual(self.events, [])
+        self.assertEqual(self.db.get_changes(0), [])
+        self.assertEqual(self.db.get_all_clients(), [])
+
+    def test_table_filter(self):
+        self.db.subscribe(self.events.append, 'products')
+        self.db.add_client('Иван', 'ivan@mail.ru', '1')
+        product_id = self.db.add_product('Чай', 10.0)
+        self.assertEqual([(e.table, e.row_id) for e in self.events], [('products', product_id)])
+        self.db.unsubscribe(self.events.append)
+        self.db.add_product('Кофе', 20.0)
+        self.assertEqual(len(self.events), 1)
+
+    def test_get_changes_since(self):
+        self.db.add_client('Иван', 'ivan@mail.ru', '1')
+        self.db.add_product('Чай', 10.0)
+        self.db.delete_client('Иван')
+        changes = self.db.get_changes(0)
+        self.assertEqual([(e.table, e.action) for e in changes],
+                         [('clients', ChangeEvent.INSERT), ('products', ChangeEvent.INSERT),
+                          ('clients', ChangeEvent.DELETE)])
+        ids = [e.change_id for e in changes]
+        self.assertEqual(ids, sorted(ids))
+        as_dicts = lambda events: [e.to_dict() for e in events]
+        self.assertEqual(as_dicts(self.db.get_changes(ids[0])), as_dicts(changes[1:]))
+        self.assertEqual(as_dicts(self.db.get_changes(0, limit=2)), as_dicts(changes[:2]))
+        self.assertEqual(self.db.get_changes(ids[-1]), [])
+
+    def test_log_is_pruned_below_active_cursors(self):
+        for i in range(5):
+            self.db.add_product(f'Товар {i}', 10.0)
+        self.db.save_cursor('first', 2)
+        self.db.save_cursor('second', 4)
+        self.assertEqual([e.change_id for e in self.db.get_changes(0)], [3, 4, 5])
+
+        # Курсор, не обновлявшийся дольше CURSOR_MAX_AGE, не удерживает журнал
+        self.db.connection.execute("UPDATE change_cursors SET updated_at = '2000-01-01 00:00:00' "
+                                   "WHERE consumer = 'first'")
+        self.db.remove_cursor('second')
+        self.db.save_cursor('third', 5)
+        self.assertEqual([e.change_id for e in self.db.get_changes(0)], [5])  # Последняя запись остаётся
+        self.assertEqual(self.db.get_last_change_id(), 5)
+        self.db.add_product('Товар 5', 10.0)
+        self.assertEqual(self.db.get_last_change_id(), 6)
+
+
+class AppChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp.name, 'orders.db')
+        self.db = Database(self.db_file)
+        self.other = Database(self.db_file)  # Другой процесс с той же базой
+        self.app = self.make_app(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        self.other.close()
+        self.tmp.cleanup()
+
+    def make_app(self, db):
+        """Создаёт приложение без окна: виджеты заменены списками."""
+        app = object.__new__(gui.OrderManagementApp)
+        app.root = FakeRoot()
+        app.db = db
+        app.consumer = 'gui-test'
+        app.applied_changes = set()
+        app.task_listbox = FakeList()
+        app.product_display = FakeList()
+        app.client_dropdown = {}
+        app.product_dropdown = {}
+        app.last_change_id = db.get_last_change_id()
+        app.load_clients()
+        app.load_products()
+        db.subscribe(app.apply_change)
+        return app
+
+    def test_own_and_other_changes_are_applied_once(self):
+        self.other.add_client('Пётр', 'petr@mail.ru', '2', commit=False)  # Номер изменения меньше, чем у своего
+        self.db.connection.execute('PRAGMA busy_timeout = 5000')
+        self.other.commit()
+        self.db.add_client('Иван', 'ivan@mail.ru', '1')
+        self.assertEqual(self.app.task_listbox.items, ['Иван | ivan@mail.ru | 1'])
+        self.assertEqual(self.app.last_change_id, 0)  # Собственное событие курсор не двигает
+
+        self.app.poll_changes()
+        self.assertEqual(self.app.task_listbox.items, ['Иван | ivan@mail.ru | 1', 'Пётр | petr@mail.ru | 2'])
+        self.assertEqual(self.app.last_change_id, 2)
+        self.assertEqual(self.app.applied_changes, set())
+        self.assertEqual(self.app.root.calls, [self.app.poll_changes])
+
+        self.other.delete_client('Пётр')
+        self.app.poll_changes()
+        self.app.poll_changes()
+        self.assertEqual(self.app.task_listbox.items, ['Иван | ivan@mail.ru | 1'])
+        self.assertEqual(list(self.app.clients), self.app.client_ids)
+
+    def test_poll_reloads_after_log_was_pruned(self):
+        self.other.add_product('Чай', 10.0)
+        self.other.add_product('Кофе', 20.0)
+        self.other.save_cursor('other', 2)
+        self.other.remove_cursor('gui-test')  # Курсор приложения устарел и удалён
+        self.other.prune_changes()
+        self.other.add_product('Сок', 30.0)
+        self.app.poll_changes()
+        self.assertEqual(sorted(product[1] for product in self.app.products.values()), ['Кофе', 'Сок', 'Чай'])
+        self.assertEqual(self.app.last_change_id, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import numpy as np
+import analysis
+from columnar import ColumnarStore, export_columnar
+
+
+class ColumnarTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, 'columnar')
+        self.connection = sqlite3.connect(os.path.join(self.tmp.name, 'orders.db'))
+        self.connection.executescript('''
+        CREATE TABLE clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL);
+        CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, price REAL NOT NULL);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, client_id INTEGER NOT NULL,
+                             product_id INTEGER NOT NULL);
+        INSERT INTO clients(name) VALUES ('Иван'), ('Пётр'), ('Анна');
+        INSERT INTO products(name, price) VALUES ('Чай', 10.0), ('Кофе', 20.0);
+        ''')
+
+    def tearDown(self):
+        self.connection.close()
+        self.tmp.cleanup()
+
+    def add_orders(self, orders):
+        columns = 'client_id, product_id' + (', order_date' if len(orders[0]) == 3 else '')
+        self.connection.executemany(f"INSERT INTO orders({columns}) VALUES({', '.join('?' * len(orders[0]))})",
+                                    orders)
+        self.connection.commit()
+
+    def exact_orders(self):
+        return self.connection.execute("SELECT id, client_id, product_id FROM orders ORDER BY id").fetchall()
+
+    def stored_orders(self, store):
+        df = store.table('orders')
+        return list(zip(df['id'].tolist(), df['client_id'].tolist(), df['product_id'].tolist()))
+
+    def test_incremental_append(self):
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                self.connection.execute("DELETE FROM orders")
+                self.add_orders([(1, 1), (2, 2)])
+                directory = f"{self.directory}-{compress}"
+                self.assertEqual(export_columnar(self.connection, directory, compress), 2)
+                self.add_orders([(3, 1), (1, 2), (2, 1)])
+                self.assertEqual(export_columnar(self.connection, directory, compress), 3)
+                self.assertEqual(export_columnar(self.connection, directory, compress), 0)
+
+                store = ColumnarStore(directory)
+                self.assertEqual(store.high_water_mark, self.exact_orders()[-1][0])
+                self.assertEqual(self.stored_orders(store), self.exact_orders())
+                self.assertEqual(list(store.table('clients')['name']), ['Иван', 'Пётр', 'Анна'])
+
+    def test_meta_is_reset_when_columns_change(self):
+        self.add_orders([(1, 1), (2, 2)])
+        export_columnar(self.connection, self.directory)
+        self.assertFalse(ColumnarStore(self.directory).has_column('orders', 'order_date'))
+
+        self.connection.execute("ALTER TABLE orders ADD COLUMN order_date TEXT")
+        self.add_orders([(3, 1, '2024-01-02 10:00:00')])
+        self.assertEqual(export_columnar(self.connection, self.directory), 3)
+        store = ColumnarStore(self.directory)
+        self.assertTrue(store.has_column('orders', 'order_date'))
+        self.assertEqual(self.stored_orders(store), self.exact_orders())
+        self.assertEqual(int(np.isnat(store.column('orders', 'order_date')).sum()), 2)
+
+    def test_columns_are_memory_mapped(self):
+        self.add_orders([(1, 1), (2, 2)])
+        export_columnar(self.connection, self.directory)
+        self.assertIsInstance(ColumnarStore(self.directory).column('orders', 'client_id'), np.memmap)
+
+        export_columnar(self.connection, self.directory + '-gz', compress=True)
+        column = ColumnarStore(self.directory + '-gz').column('orders', 'client_id')
+        self.assertNotIsInstance(column, np.memmap)
+        self.assertEqual(column.tolist(), [1, 2])
+
+    def test_order_trends_needs_order_date(self):
+        self.add_orders([(1, 1), (2, 2)])
+        export_columnar(self.connection, self.directory)
+        store = ColumnarStore(self.directory)
+        with self.assertRaises(KeyError):
+            store.column('orders', 'order_date')
+        with self.assertRaises(ValueError):
+            analysis.order_trends(store)
+
+        self.connection.execute("ALTER TABLE orders ADD COLUMN order_date TEXT")
+        self.add_orders([(3, 1, '2024-01-02 10:00:00'), (1, 2, '2024-01-02 11:00:00'),
+                         (2, 1, '2024-01-03 09:00:00')])
+        export_columnar(self.connection, self.directory)
+        df = analysis.order_trends(ColumnarStore(self.directory))
+        self.assertEqual(df.values.tolist(), [['2024-01-02', 2], ['2024-01-03', 1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
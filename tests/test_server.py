@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import gui
+import server
+from models import Order
+from server import OrderServer, RemoteDatabase, ServerError
+
+
+class CountingServer(OrderServer):
+    """Сервер, запоминающий размеры групп операций."""
+
+    def __init__(self, *args, **kwargs):
+        self.group_sizes = []
+        super().__init__(*args, **kwargs)
+
+    def _run_group(self, db, group):
+        self.group_sizes.append(len(group))
+        super()._run_group(db, group)
+
+
+class OrderServerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp.name, 'orders.db')
+        self.snapshot_dir = os.path.join(self.tmp.name, 'snapshots')
+        self.server = CountingServer(self.db_file, port=0, snapshot_dir=self.snapshot_dir,
+                                     busy_timeout=200).start()
+        self.db = RemoteDatabase(self.server.url, timeout=10)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.tmp.cleanup()
+
+    def count(self, table):
+        connection = sqlite3.connect(self.db_file)
+        try:
+            return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_concurrent_clients(self):
+        client_id = self.db.add_client('Иван', 'ivan@mail.ru', '1234567890')
+        product_id = self.db.add_product('Чай', 10.0)
+        errors = []
+
+        def add_order():
+            try:
+                RemoteDatabase(self.server.url, timeout=10).add_order(Order(client_id, product_id))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=add_order) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.count('orders'), 50)
+
+    def test_group_commit(self):
+        futures = self.server.submit([('add_product', {'name': 'A', 'price': 1})])
+        futures += self.server.submit([('add_product', {'name': 'B', 'price': 2})])
+        for future in futures:
+            future.result(timeout=10)
+        self.assertIn(2, self.server.group_sizes)
+        self.assertEqual(self.count('products'), 2)
+
+    def test_failed_operation_does_not_roll_back_batch(self):
+        results = self.db.batch([
+            ('add_client', {'name': 'A', 'email': 'a@mail.ru', 'phone': '1'}),
+            ('add_client', {'name': 'B', 'email': 'a@mail.ru', 'phone': '1'}),
+            ('add_client', {'name': 'C', 'email': 'c@mail.ru', 'phone': '1'}),
+        ])
+        self.assertIsInstance(results[1], ServerError)
+        self.assertIsInstance(results[0], int)
+        self.assertIsInstance(results[2], int)
+        self.assertEqual([row[1] for row in self.db.get_all_clients()], ['A', 'C'])
+
+    def test_worker_survives_locked_database(self):
+        other = sqlite3.connect(self.db_file)
+        other.execute('BEGIN IMMEDIATE')  # В режиме WAL запись блокирует только другая запись
+        try:
+            with self.assertRaises(ServerError):
+                self.db.add_client('A', 'a@mail.ru', '1')
+        finally:
+            other.rollback()
+            other.close()
+        self.assertTrue(self.server.worker.is_alive())
+        self.db.add_client('B', 'b@mail.ru', '1')
+        self.assertEqual([row[1] for row in self.db.get_all_clients()], ['B'])
+
+    def test_gui_adds_order_through_server(self):
+        client_id = self.db.add_client('Иван', 'ivan@mail.ru', '1234567890')
+        product_id = self.db.add_product('Чай', 10.0)
+        app = object.__new__(gui.OrderManagementApp)  # Без окна: нужны только списки и поля выбора
+        app.db = self.db
+        app.clients = {row[0]: row for row in self.db.get_all_clients()}
+        app.products = {row[0]: row for row in self.db.get_all_products()}
+        app.client_var = SimpleNamespace(get=lambda: 'Иван')
+        app.product_var = SimpleNamespace(get=lambda: 'Чай')
+        app.orders_display = SimpleNamespace(insert=lambda *args: None)
+        app.add_order()
+        connection = sqlite3.connect(self.db_file)
+        try:
+            self.assertEqual(connection.execute("SELECT client_id, product_id FROM orders").fetchall(),
+                             [(client_id, product_id)])
+        finally:
+            connection.close()
+
+    def test_reports_do_not_delay_writes(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_report(connection, params):
+            started.set()
+            release.wait(10)
+            connection.execute("INSERT INTO products(name, price) VALUES('X', 1)")
+
+        with mock.patch.dict(server.REPORT_OPERATIONS, {'slow_report': slow_report}):
+            future = self.server.submit([('slow_report', {})])[0]
+            self.assertTrue(started.wait(10))
+            try:
+                self.db.add_product('Чай', 10.0)
+                self.assertFalse(future.done())
+            finally:
+                release.set()
+            with self.assertRaises(sqlite3.OperationalError):
+                future.result(timeout=10)  # Соединение отчётов только для чтения
+        self.assertEqual(self.count('products'), 1)
+
+    def test_reports(self):
+        clients = [self.db.add_client(name, f'{name}@mail.ru', '1') for name in ('A', 'B', 'C')]
+        product_id = self.db.add_product('Чай', 10.0)
+        for client_id, orders in zip(clients, (3, 1, 2)):
+            for _ in range(orders):
+                self.db.add_order(Order(client_id, product_id))
+        exact = self.db.report('top_clients')
+        approximate = self.db.report('top_clients', approximate=True)
+        self.assertEqual(exact.values.tolist(), [['A', 3], ['C', 2], ['B', 1]])
+        self.assertEqual(approximate[['name', 'order_count']].values.tolist(), exact.values.tolist())
+        self.assertEqual(approximate['error_bound'].tolist(), [0, 0, 0])
+        self.assertEqual(self.db.report('client_network').number_of_edges(), 3)
+
+    def test_snapshot_is_written_to_server_directory(self):
+        name = self.db.create_snapshot()
+        self.assertEqual(os.path.basename(name), name)
+        self.assertTrue(os.path.exists(os.path.join(self.snapshot_dir, name)))
+        with self.assertRaises(ServerError):
+            self.db.call('backup', target_file=os.path.join(self.tmp.name, 'evil.db'))
+
+
+if __name__ == '__main__':
+    unittest.main()
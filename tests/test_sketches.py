@@ -0,0 +1,249 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+import analysis
+import sketches
+from db import Database
+from models import Order
+from sketches import HyperLogLog, SketchStore, SpaceSaving
+
+
+class SpaceSavingTest(unittest.TestCase):
+    def test_error_bounds_contain_true_counts(self):
+        rng = random.Random(1)
+        stream = [min(int(rng.paretovariate(1.2)), 200) for _ in range(5000)]
+        sketch = SpaceSaving(capacity=20)
+        for key in stream:
+            sketch.add(key)
+        self.assertEqual(sketch.total, len(stream))
+        for key, count, error in sketch.top():
+            self.assertLessEqual(count - error, stream.count(key))
+            self.assertGreaterEqual(count, stream.count(key))
+            self.assertLessEqual(error, sketch.total / sketch.capacity)
+        self.assertEqual(sketch.top()[0][0], 1)
+
+    def test_round_trip(self):
+        sketch = SpaceSaving(capacity=3)
+        for key in [1, 2, 3, 4, 1, 1]:
+            sketch.add(key)
+        self.assertEqual(SpaceSaving.from_dict(sketch.to_dict()).top(), sketch.top())
+
+
+class HyperLogLogTest(unittest.TestCase):
+    def test_sparse_until_threshold(self):
+        sketch = HyperLogLog()
+        limit = (1 << sketch.precision) // sketches.HLL_SPARSE_DIVISOR
+        value = 0
+        while sketch.sparse is not None:
+            sketch.add(value)
+            value += 1
+            if sketch.sparse is not None:
+                self.assertLessEqual(len(sketch.sparse), limit)
+        self.assertEqual(len(sketch.registers), 1 << sketch.precision)
+        self.assertEqual(sum(1 for register in sketch.registers if register), limit + 1)
+
+    def test_estimate_within_error(self):
+        for count in (10, 1000, 20000):
+            with self.subTest(count=count):
+                sketch = HyperLogLog()
+                for value in range(count):
+                    sketch.add(value)
+                error = 3 * sketch.relative_error() * count
+                self.assertLess(abs(sketch.estimate() - count), max(error, 1))
+
+    def test_round_trip_and_merge(self):
+        small, large = HyperLogLog(), HyperLogLog()
+        for value in range(5):
+            small.add(value)
+        for value in range(3000):
+            large.add(value)
+        self.assertIsNotNone(small.sparse)
+        self.assertIsNone(large.sparse)
+        for sketch in (small, large):
+            self.assertEqual(HyperLogLog.from_dict(sketch.to_dict()).estimate(), sketch.estimate())
+        small.merge(large)
+        self.assertEqual(small.estimate(), large.estimate())
+
+
+class SketchStoreTest(unittest.TestCase):
+    DAYS = ['2024-01-01 10:00:00', '2024-01-02 10:00:00', '2024-01-03 10:00:00']
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp.name, 'orders.db')
+        self.rng = random.Random(2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fill(self, db, orders):
+        """Добавляет клиентов, товары и заказы за несколько дней."""
+        if not db.get_all_clients():
+            for i in range(8):
+                db.add_client(f'Клиент {i}', f'client{i}@mail.ru', '1')
+            for i in range(3):
+                db.add_product(f'Товар {i}', 10.0)
+        clients = [row[0] for row in db.get_all_clients()]
+        products = [row[0] for row in db.get_all_products()]
+        db.connection.executemany("INSERT INTO orders(client_id, product_id, order_date) VALUES(?,?,?)",
+                                  [(clients[min(int(self.rng.expovariate(0.5)), len(clients) - 1)],
+                                    self.rng.choice(products), self.rng.choice(self.DAYS))
+                                   for _ in range(orders)])
+        db.connection.commit()
+
+    def assert_matches_exact(self, connection):
+        exact = analysis.top_clients(connection).set_index('name')['order_count']
+        approximate = analysis.top_clients(connection, approximate=True)
+        self.assertEqual(len(approximate), len(exact))
+        for name, count, error in approximate.itertuples(index=False):
+            self.assertLessEqual(count - error, exact[name])
+            self.assertGreaterEqual(count, exact[name])
+
+        exact = analysis.order_trends(connection)
+        approximate = analysis.order_trends(connection, approximate=True)
+        self.assertEqual(list(approximate['order_date']), list(exact['order_date']))
+        for estimate, error, count in zip(approximate['order_count'], approximate['error_bound'],
+                                          exact['order_count']):
+            self.assertLessEqual(abs(estimate - count), 2 * error + 1)  # 2 полуширины 95% интервала
+
+        exact = analysis.distinct_clients(connection)
+        approximate = analysis.distinct_clients(connection, approximate=True)
+        self.assertEqual(sorted(zip(approximate['product_id'], approximate['order_date'])),
+                         sorted(zip(exact['product_id'], exact['order_date'])))
+        merged = exact.merge(approximate, on=['product_id', 'order_date'], suffixes=('', '_estimate'))
+        for count, estimate, error in zip(merged['distinct_clients'], merged['distinct_clients_estimate'],
+                                          merged['error_bound']):
+            self.assertLessEqual(abs(estimate - count), 2 * error + 1)
+
+    def test_matches_exact_reports(self):
+        db = Database(self.db_file)
+        try:
+            self.fill(db, 600)
+            SketchStore.attach(db)
+            self.fill(db, 1)
+            db.add_order(Order(1, 1))  # Скетчи догоняют заказы по событию фиксации
+            self.assert_matches_exact(db.connection)
+            G = analysis.client_network(db.connection, approximate=True)
+            self.assertEqual(G.graph['sample_fraction'], 1.0)
+            self.assertEqual(set(map(frozenset, G.edges())),
+                             set(map(frozenset, analysis.client_network(db.connection).edges())))
+            SketchStore.detach(db)
+        finally:
+            db.close()
+
+    def test_sampled_reports_after_reopen(self):
+        # Выборка из 200 заказов меньше числа заказов
+        with mock.patch.object(sketches.Reservoir.__init__, '__defaults__', (200, None, 0)):
+            db = Database(self.db_file)
+            try:
+                self.fill(db, 1000)
+                store = SketchStore.attach(db)
+                SketchStore.detach(db)
+                self.assertEqual(len(store.reservoir.items), 200)
+            finally:
+                db.close()
+
+            # Заказы, добавленные без подключённых скетчей (другим процессом)
+            db = Database(self.db_file)
+            try:
+                self.fill(db, 300)
+            finally:
+                db.close()
+
+            db = Database(self.db_file)
+            try:
+                with mock.patch.object(SketchStore, 'rebuild', side_effect=AssertionError):
+                    store = SketchStore.load(db.connection)
+                    self.assertEqual(store.reservoir.seen, 1300)
+                    self.assertEqual(store.top_clients_sketch.total, 1300)
+                    self.assert_matches_exact(db.connection)
+                    G = analysis.client_network(db.connection, approximate=True)
+                    self.assertAlmostEqual(G.graph['sample_fraction'], 200 / 1300)
+                    exact = set(map(frozenset, analysis.client_network(db.connection).edges()))
+                    self.assertLessEqual(set(map(frozenset, G.edges())), exact)
+            finally:
+                db.close()
+
+    def test_parts_catch_up_from_own_cursors(self):
+        db = Database(self.db_file)
+        try:
+            self.fill(db, 100)
+            SketchStore.attach(db)
+            SketchStore.detach(db)
+
+            store = SketchStore(db.connection)
+            store.ensure('top_clients')
+            self.assertEqual(set(store.cursors), {'top_clients'})
+            self.fill(db, 50)
+            store.update()
+            self.assertEqual(store.top_clients_sketch.total, 150)
+
+            store.ensure('reservoir')
+            self.assertEqual(store.cursors['reservoir'], 100)
+            self.assertEqual(store.update(), 50)
+            self.assertEqual(store.top_clients_sketch.total, 150)
+            self.assertEqual(store.reservoir.seen, 150)
+            self.assertEqual(len(set(store.cursors.values())), 1)
+        finally:
+            db.close()
+
+    def test_two_writers_keep_one_sample(self):
+        # Выборка из 20 заказов: процессы заменяют в ней разные ячейки
+        with mock.patch.object(sketches.Reservoir.__init__, '__defaults__', (20, None, 0)):
+            first, second = Database(self.db_file), Database(self.db_file)
+            try:
+                self.fill(first, 10)
+                SketchStore.attach(first)
+                SketchStore.attach(second)
+                for i in range(200):
+                    (first if i % 3 else second).add_order(Order(1 + i % 8, 1))
+                SketchStore.detach(first)
+                SketchStore.detach(second)
+                saved = [row[0] for row in first.connection.execute("SELECT order_id FROM sketch_samples")]
+                store = SketchStore.load(first.connection)
+            finally:
+                first.close()
+                second.close()
+        self.assertEqual(len(saved), 20)
+        self.assertEqual(len(set(saved)), 20)
+        self.assertEqual(sorted(item[0] for item in store.reservoir.items), sorted(saved))
+        self.assertEqual(store.reservoir.seen, 210)
+        self.assertEqual(store.top_clients_sketch.total, 210)
+
+    def test_orders_without_date_are_left_out_of_daily_reports(self):
+        connection = sqlite3.connect(self.db_file)
+        connection.executescript('''
+        CREATE TABLE clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+                              email TEXT NOT NULL UNIQUE, phone TEXT NOT NULL);
+        CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, price REAL NOT NULL);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, client_id INTEGER NOT NULL,
+                             product_id INTEGER NOT NULL);
+        INSERT INTO clients(name, email, phone) VALUES ('Иван', 'ivan@mail.ru', '1');
+        INSERT INTO products(name, price) VALUES ('Чай', 10.0);
+        INSERT INTO orders(client_id, product_id) VALUES (1, 1), (1, 1), (1, 1), (1, 1), (1, 1);
+        ''')
+        connection.close()
+
+        db = Database(self.db_file)
+        try:
+            for approximate in (False, True):
+                with self.subTest(approximate=approximate):
+                    self.assertTrue(analysis.order_trends(db.connection, approximate).empty)
+                    self.assertTrue(analysis.distinct_clients(db.connection, approximate).empty)
+                    top = analysis.top_clients(db.connection, approximate)
+                    self.assertEqual(top[['name', 'order_count']].values.tolist(), [['Иван', 5]])
+            db.add_order(Order(1, 1))
+            for approximate in (False, True):
+                with self.subTest(approximate=approximate):
+                    trends = analysis.order_trends(db.connection, approximate)
+                    self.assertEqual(trends['order_count'].tolist(), [1])
+                    self.assertFalse(trends['order_date'].isna().any())
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()